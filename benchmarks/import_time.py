@@ -0,0 +1,61 @@
+"""
+Import-time benchmark for the dashboard.
+
+Runs `python -X importtime` on the controller in a fresh interpreter, prints
+the total startup cost and the slowest top-level packages, and fails when a
+package that should be loaded lazily is imported at startup.
+
+    python benchmarks/import_time.py [--repeat N] [--top N]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET = 'src.controllers.main_controller'
+LAZY_PACKAGES = ['textblob', 'nltk', 'langchain_openai', 'langchain', 'sklearn']
+LINE_PATTERN = re.compile(r'import time:\s+(\d+) \|\s+\d+ \| +(\S+)')
+
+
+def measure(target=TARGET):
+    """Return {top-level package: microseconds spent in its modules} for one cold import"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    packages = defaultdict(int)
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            packages[match.group(2).split('.')[0]] += int(match.group(1))
+    return packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.repeat)]
+    totals = sorted(sum(run.values()) for run in runs)
+    best = min(runs, key=lambda run: sum(run.values()))
+
+    print(f"Import of {TARGET}: best {totals[0] / 1e6:.3f}s, median {totals[len(totals) // 2] / 1e6:.3f}s")
+    for package, micros in sorted(best.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<24} {micros / 1e6:.3f}s")
+
+    eager = [package for package in LAZY_PACKAGES if package in best]
+    if eager:
+        print(f"Imported at startup but should be lazy: {', '.join(eager)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""
+Memory footprint of the posts table per column, before and after the
+compact dtype schema of apply_schema.
+
+    python benchmarks/memory_report.py [CSV ...]
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.models.data_model import DEFAULT_DATASET, memory_report  # noqa: E402
+
+
+def main():
+    for filepath in sys.argv[1:] or [os.path.join(ROOT, DEFAULT_DATASET)]:
+        report = memory_report(filepath)
+        print(f"{os.path.basename(filepath)}")
+        print(report.to_string(formatters={
+            'before': '{:,.0f}'.format,
+            'after': '{:,.0f}'.format,
+            'saved': '{:.0%}'.format
+        }))
+        print()
+
+
+if __name__ == '__main__':
+    main()
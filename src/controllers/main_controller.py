@@ -1,27 +1,46 @@
 import traceback
 import os
 import streamlit as st
-from langchain_openai import ChatOpenAI
-import pandas as pd
 
 from src.models.data_model import (
-    categorize_sentiment,
-    get_hashtag_frequency,
+    DEFAULT_DATASET,
+    DatasetAggregates,
+    DateIndex,
+    append_rows,
+    build_author_table,
+    categorize_sentiments,
+    compute_metrics,
+    content_hashes,
     get_location_counts,
-    get_sentiment,
-    get_word_frequency,
-    analyze_text_content,
     load_and_process_data,
+    read_appended_rows,
+    update_author_table,
 )
+from src.models.chatbot import ChatClient, build_context, build_question_context
+from src.models.dataset_registry import DatasetRegistry, discover_datasets
+from src.models.media import MediaCache
+from src.models.phrase_index import (
+    NgramIndex,
+    SelectionCounts,
+    phrase_frequency_from_counts,
+)
+from src.models.ranking import TopRanking
+from src.models.retrieval import BM25Index, index_path
+from src.models.search_index import InvertedIndex
+from src.models.sentiment_store import SentimentStore
 from src.views.dashboard_view import (
     apply_custom_css,
-    create_tabs,
     create_audio_player,
     create_video_player,
+    display_dataset_selector,
     display_title,
+    render_tabs,
+    watch_dataset,
 )
 from src.views.filters_view import display_filters
 from src.views.metrics_view import (
+    choose_scatter_sampling,
+    choose_table_page,
     create_engagement_scatter,
     create_hashtag_chart,
     create_location_chart,
@@ -33,6 +52,390 @@ from src.views.metrics_view import (
 )
 
 
+@st.cache_resource(show_spinner=False)
+def get_sentiment_store():
+    """Process-wide sentiment store, persisted across server restarts"""
+    return SentimentStore()
+
+
+@st.cache_resource(show_spinner=False)
+def get_media_cache():
+    """Process-wide, size-bounded cache of media file contents for the players and downloads"""
+    return MediaCache()
+
+
+@st.cache_resource(show_spinner=False)
+def get_chat_client():
+    """Process-wide chatbot client, sharing one model connection and a persistent response cache"""
+    return ChatClient()
+
+
+def get_selection_counts(name, distinct=False):
+    """Per-session running totals that follow the filtered posts"""
+    key = f"selection_counts_{name}"
+    if key not in st.session_state:
+        st.session_state[key] = SelectionCounts(distinct=distinct)
+    return st.session_state[key]
+
+
+def _load_dataset(filepath):
+    """
+    Processed and scored dataset, loaded once per version of the source
+    file, with the date index and author table when they were built
+    during ingestion.
+    """
+    store = get_sentiment_store()
+    aggregates = DatasetAggregates()
+
+    def on_chunk(chunk):
+        # Score while ingesting, so large files are scored chunk by chunk and the lookup below is a hit
+        store.score(chunk['content'])
+        aggregates.add(chunk)
+
+    df = load_and_process_data(filepath, on_chunk=on_chunk)
+    return _score_rows(df), aggregates.resources()
+
+
+def _score_rows(df):
+    """Add content hashes and sentiment to processed rows"""
+    df['content_hash'] = content_hashes(df['content'])
+    df['sentiment_score'] = get_sentiment_store().score(df['content'])
+    df['sentiment'] = categorize_sentiments(df['sentiment_score'])
+    return df
+
+
+def _append_to_dataset(df, filepath, offset, signature, size):
+    """Merge the posts appended to filepath between byte offset and size, scoring only those"""
+    new_rows = read_appended_rows(filepath, offset, signature, size)
+    if new_rows is None:
+        return None
+    return append_rows(df, _score_rows(new_rows))
+
+
+@st.cache_resource(show_spinner=False)
+def get_dataset_registry():
+    """Process-wide registry of loaded datasets, evicted by recency and memory use"""
+    return DatasetRegistry(_load_dataset, _append_to_dataset)
+
+
+def get_dataset(filepath=DEFAULT_DATASET):
+    """Return the cached dataset for the current version of filepath"""
+    return get_dataset_registry().get(filepath)
+
+
+def get_search_index(filepath=DEFAULT_DATASET):
+    """Return the word filter index for the current version of filepath"""
+    return get_dataset_registry().resource(
+        filepath, 'search_index', InvertedIndex,
+        lambda index, df, start: index.extend(df, start)
+    )
+
+
+def get_date_index(filepath=DEFAULT_DATASET):
+    """Return the date index for the current version of filepath"""
+    return get_dataset_registry().resource(
+        filepath, 'date_index', DateIndex,
+        lambda index, df, start: index.extend(df.iloc[start:])
+    )
+
+
+def get_author_table(filepath=DEFAULT_DATASET):
+    """Return the author table for the current version of filepath"""
+    return get_dataset_registry().resource(
+        filepath, 'author_table', build_author_table,
+        lambda authors, df, start: update_author_table(authors, df.iloc[start:])
+    )
+
+
+def get_ngram_index(filepath=DEFAULT_DATASET):
+    """Return the per-post phrase and hashtag counts of filepath, kept while the dataset is loaded"""
+    return get_dataset_registry().resource(
+        filepath, 'ngram_index', lambda df: NgramIndex(),
+        lambda index, df, start: index
+    )
+
+
+def get_chat_context(filepath=DEFAULT_DATASET):
+    """Chatbot context for the current version of filepath, built once and shared by every session"""
+    return get_dataset_registry().resource(filepath, 'chat_context', build_context)
+
+
+def _open_retrieval_index(filepath, df):
+    """On-disk retrieval index of a dataset, brought up to date with its posts"""
+    index = BM25Index(index_path(filepath))
+    index.add(df['content_hash'], df['content'])
+    return index
+
+
+def _extend_retrieval_index(index, df, start):
+    index.add(df['content_hash'].iloc[start:], df['content'].iloc[start:])
+    return index
+
+
+def get_retrieval_index(filepath=DEFAULT_DATASET):
+    """Return the chatbot retrieval index for the current version of filepath"""
+    return get_dataset_registry().resource(
+        filepath, 'retrieval_index',
+        lambda df: _open_retrieval_index(filepath, df),
+        _extend_retrieval_index
+    )
+
+
+def render_engagement_tab(filtered_df, filter_plan):
+    """Engagement scatter, rebuilt only when the selection or the sampling changes"""
+    sampling = choose_scatter_sampling(filtered_df)
+    figure = filter_plan.memo(
+        'engagement_scatter', (filter_plan.key, sampling),
+        lambda: create_engagement_scatter(filtered_df, sampling)
+    )
+    st.plotly_chart(
+        figure,
+        use_container_width=True,
+        config={
+            'displayModeBar': True,
+            'displaylogo': False,
+            'modeBarButtonsToRemove': ['lasso2d', 'select2d'],
+            'scrollZoom': True
+        }
+    )
+
+
+def _analysis_charts(filtered_df, ngram_index, word_range, include_common):
+    """
+    Phrase, location and hashtag charts of the Analysis tab for one
+    selection. The result is memoized, so nothing is rendered here;
+    'phrases_missing' is 'no_text' or 'no_phrases' when there is no
+    phrase chart, for the caller to explain.
+    """
+    # Phrase totals follow the filters by adding and removing posts
+    has_text = filtered_df['content'].fillna('').astype(str).str.strip().ne('').any()
+    
+    word_freq_chart = None
+    phrases_missing = 'no_text'
+    if has_text:
+        def phrase_counts(content_hash, text):
+            return ngram_index.phrase_counts(content_hash, text, include_common, word_range[0], word_range[1])
+        
+        # Only phrases of the selected lengths are counted, so other settings start over
+        params = (include_common, tuple(word_range))
+        phrase_totals = get_selection_counts("phrases").bind(ngram_index, params).update(
+            filtered_df['content_hash'], filtered_df['content'], phrase_counts
+        )
+        phrase_documents = get_selection_counts("phrase_documents", distinct=True).bind(ngram_index, params).update(
+            filtered_df['content_hash'], filtered_df['content'], phrase_counts
+        )
+        word_freq = phrase_frequency_from_counts(phrase_totals, word_range[0], word_range[1], top_k=20)
+        
+        # Create and display chart using improved analysis
+        word_freq_chart = create_word_freq_chart(
+            word_freq,
+            min_words=word_range[0],
+            max_words=word_range[1],
+            document_freq={phrase: phrase_documents[tuple(phrase.split())] for phrase in word_freq}
+        )
+        phrases_missing = None if word_freq_chart is not None else 'no_phrases'
+    
+    hashtag_freq = get_selection_counts("hashtags").bind(ngram_index).update(
+        filtered_df['content_hash'],
+        filtered_df['content'],
+        ngram_index.hashtag_counts
+    )
+    return {
+        'phrases': word_freq_chart,
+        'phrases_missing': phrases_missing,
+        'locations': create_location_chart(get_location_counts(filtered_df)),
+        'hashtags': create_hashtag_chart(hashtag_freq),
+    }
+
+
+def render_analysis_tab(filtered_df, filter_plan, sentiment_counts, ngram_index):
+    """Phrase, location, sentiment and hashtag charts and the top posts table"""
+    col1, col2 = st.columns([0.6, 0.4])
+
+    with col1:
+        # Word frequency section
+        st.markdown("### Phrase Analysis Settings")
+
+        # Controls in a single row
+        control_cols = st.columns([0.6, 0.4])
+        with control_cols[0]:
+            word_range = st.slider(
+                "Phrase Length (words)",
+                min_value=2,
+                max_value=8,
+                key='phrase_length',
+                help="Control the minimum and maximum number of words in phrases"
+            )
+
+        with control_cols[1]:
+            include_common = st.checkbox(
+                "Include common terms",
+                key='include_common',
+                help="Toggle to include/exclude common descriptive terms"
+            )
+
+        charts = filter_plan.memo(
+            'analysis_charts', (filter_plan.key, tuple(word_range), include_common),
+            lambda: _analysis_charts(filtered_df, ngram_index, word_range, include_common)
+        )
+        
+        if charts['phrases_missing'] == 'no_text':
+            st.warning("No text content available for analysis")
+        elif charts['phrases_missing'] == 'no_phrases':
+            st.info("No significant phrases found. Try including common terms or adjusting filters.")
+        else:
+            st.plotly_chart(
+                charts['phrases'],
+                use_container_width=True,
+                config={'displayModeBar': False}
+            )
+        
+        # Location chart
+        st.plotly_chart(
+            charts['locations'],
+            use_container_width=True,
+            config={'displayModeBar': False}
+        )
+
+    with col2:
+        # Sentiment pie chart
+        st.plotly_chart(
+            create_pie_chart(sentiment_counts),
+            use_container_width=True,
+            config={'displayModeBar': False}
+        )
+        
+        # Hashtag frequency chart
+        st.plotly_chart(
+            charts['hashtags'],
+            use_container_width=True,
+            config={'displayModeBar': False}
+        )
+
+    st.markdown("""
+        <h3 style='text-align: center; margin: 2rem 0; 
+        font-size: clamp(1.2rem, 1.8vw, 1.8rem);'>📝 Top Viewed Posts</h3>
+    """, unsafe_allow_html=True)
+
+    # Ranking by views is kept per filter state and deepened one page at a time
+    ranking = filter_plan.memo(
+        'top_viewed_posts', filter_plan.key, lambda: TopRanking(filtered_df['views'].to_numpy())
+    )
+    # The table is filled in once the page picker below it has been read
+    table_slot = st.empty()
+    page = choose_table_page(len(filtered_df))
+    table_slot.dataframe(
+        create_user_table(filtered_df, ranking, page=page),
+        hide_index=True,
+        use_container_width=True
+    )
+
+
+
+def render_chatbot_tab(dataset_path):
+    """Chatbot answering from the posts of the selected dataset that best match each question"""
+    st.header("Mariposa Cocoon Chatbot 💬")
+
+    # Custom CSS for chat interface
+    st.markdown('''
+        <style>
+        .chat-message {
+            padding: 1rem;
+            border-radius: 4px;
+            margin-bottom: 1rem;
+            display: flex;
+        }
+        .chat-message.user {
+            background-color: #f0f0f0;
+        }
+        .chat-message.bot {
+            background-color: #e0e0e0;
+        }
+        .chat-message .avatar {
+            width: 10%;
+            min-width: 40px;
+        }
+        .chat-message .avatar img {
+            max-width: 40px;
+            max-height: 40px;
+            border-radius: 50%;
+            object-fit: cover;
+        }
+        .chat-message .message {
+            width: 90%;
+            padding: 0 1rem;
+            color: #333;
+            line-height: 1.4;
+        }
+        </style>
+    ''', unsafe_allow_html=True)
+
+    # HTML templates for chat messages
+    bot_template = '''
+    <div class="chat-message bot">
+        <div class="avatar">
+            <img src="https://i.ibb.co/jMf7sB0/idea.png">
+        </div>
+        <div class="message">{{MSG}}</div>
+    </div>
+    '''
+
+    user_template = '''
+    <div class="chat-message user">
+        <div class="avatar">
+            <img src="https://i.ibb.co/TcgRhzg/question-mark.png">
+        </div>    
+        <div class="message">{{MSG}}</div>
+    </div>
+    '''
+
+    # Initialize session state for chat history
+    if "chat_history" not in st.session_state:
+        st.session_state.chat_history = []
+
+    def handle_user_input(user_question):
+        # Posts relevant to the question, or the most recent ones when none match
+        context = build_question_context(
+            get_dataset(dataset_path), get_retrieval_index(dataset_path), user_question
+        ) or get_chat_context(dataset_path)
+        # Repeated questions over the same posts are answered from the response cache
+        response, _ = get_chat_client().ask(user_question, context)
+
+        st.session_state.chat_history.append(("user", user_question))
+        st.session_state.chat_history.append(("bot", response))
+
+        for role, message in st.session_state.chat_history:
+            if role == "user":
+                st.write(user_template.replace("{{MSG}}", message), unsafe_allow_html=True)
+            else:
+                st.write(bot_template.replace("{{MSG}}", message), unsafe_allow_html=True)
+
+    # Text input for user question
+    user_question = st.text_input("Ask a question about Mariposa Cocoon data:")
+    if user_question:
+        handle_user_input(user_question)
+
+    # Sidebar info
+    with st.sidebar:
+        st.title("Chatbot Info")
+        st.markdown("""
+        This chatbot answers questions about:
+        - EGFR mutations
+        - Clinical trials
+        - Drug combinations
+        - Treatment outcomes
+        - Patient experiences
+
+        Answers draw on the posts of the selected dataset that best match
+        each question, or on its most recent posts when none match.
+
+        """)
+
+        if st.button("Clear Chat"):
+            st.session_state.chat_history = []
+            st.rerun()
+
+
 def main():
     # Set OpenAI API key from secrets to environment variable
     os.environ["OPENAI_API_KEY"] = st.secrets["OPENAI_API_KEY"]
@@ -47,267 +450,33 @@ def main():
     display_title()
 
     try:
-        df = load_and_process_data()
-        df['sentiment_score'] = df['content'].apply(get_sentiment)
-        df['sentiment'] = df['sentiment_score'].apply(categorize_sentiment)
-
-        filtered_df = display_filters(df)
-
-        metrics = {
-            'Total Posts': len(filtered_df),
-            'Total Views': int(filtered_df['views'].sum()),
-            'Total Reposts': int(filtered_df['reposts'].sum()),
-            'Total Followers': int(filtered_df['followers'].sum()),
-            'Avg. Sentiment': round(filtered_df['sentiment_score'].mean(), 2)
-        }
+        dataset_path = display_dataset_selector(discover_datasets())
+        watch_dataset(dataset_path)
+        df = get_dataset(dataset_path)
+        duplicates = df.attrs.get('duplicates_dropped', 0)
+        if duplicates:
+            st.sidebar.caption(f"{duplicates:,} repeated posts merged into their latest snapshot")
 
-        display_metrics_with_icons(metrics)
+        filtered_df, filter_plan = display_filters(
+            df,
+            get_search_index(dataset_path),
+            get_date_index(dataset_path),
+            get_author_table(dataset_path)
+        )
 
-        tab1, tab3, tab4, tab5, tab6 = create_tabs()
+        metrics, sentiment_counts = compute_metrics(filtered_df)
 
-        with tab1:
-            st.plotly_chart(
-                create_engagement_scatter(filtered_df),
-                use_container_width=True,
-                config={
-                    'displayModeBar': True,
-                    'displaylogo': False,
-                    'modeBarButtonsToRemove': ['lasso2d', 'select2d'],
-                    'scrollZoom': True
-                }
-            )
+        display_metrics_with_icons(metrics)
 
-        with tab3:
-            col1, col2 = st.columns([0.6, 0.4])
-            
-            with col1:
-                # Word frequency section
-                st.markdown("### Phrase Analysis Settings")
-                
-                # Controls in a single row
-                control_cols = st.columns([0.6, 0.4])
-                with control_cols[0]:
-                    word_range = st.slider(
-                        "Phrase Length (words)",
-                        min_value=2,
-                        max_value=8,
-                        value=(2, 5),
-                        help="Control the minimum and maximum number of words in phrases"
-                    )
-                
-                with control_cols[1]:
-                    include_common = st.checkbox(
-                        "Include common terms",
-                        value=False,
-                        help="Toggle to include/exclude common descriptive terms"
-                    )
-                
-                # Process text data
-                text_data = filtered_df['content'].fillna('').astype(str)
-                non_empty_text = [text for text in text_data if text.strip()]
-                
-                if non_empty_text:
-                    # Create and display chart using improved analysis
-                    word_freq_chart = create_word_freq_chart(
-                        pd.DataFrame({'content': non_empty_text}),
-                        include_common=include_common,
-                        min_words=word_range[0],
-                        max_words=word_range[1]
-                    )
-                else:
-                    st.warning("No text content available for analysis")
-                    word_freq_chart = None
-                
-                if word_freq_chart is not None:
-                    st.plotly_chart(
-                        word_freq_chart,
-                        use_container_width=True,
-                        config={'displayModeBar': False}
-                    )
-                
-                # Location chart
-                location_counts = get_location_counts(filtered_df)
-                st.plotly_chart(
-                    create_location_chart(location_counts),
-                    use_container_width=True,
-                    config={'displayModeBar': False}
-                )
-
-            with col2:
-                # Sentiment pie chart
-                sentiment_counts = filtered_df['sentiment'].value_counts()
-                st.plotly_chart(
-                    create_pie_chart(sentiment_counts),
-                    use_container_width=True,
-                    config={'displayModeBar': False}
-                )
-                
-                # Hashtag frequency chart
-                hashtag_freq = get_hashtag_frequency(filtered_df['content'])
-                st.plotly_chart(
-                    create_hashtag_chart(hashtag_freq),
-                    use_container_width=True,
-                    config={'displayModeBar': False}
-                )
-
-            st.markdown("""
-                <h3 style='text-align: center; margin: 2rem 0; 
-                font-size: clamp(1.2rem, 1.8vw, 1.8rem);'>📝 Top Viewed Posts</h3>
-            """, unsafe_allow_html=True)
-
-            table_df = create_user_table(filtered_df)
-            st.dataframe(
-                table_df,
-                hide_index=True,
-                use_container_width=True
-            )
-            
-        with tab4:
-            create_audio_player()
-            
-        with tab5:
-            create_video_player()
-            
-        with tab6:
-            st.header("Mariposa Cocoon Chatbot 💬")
-            
-            # Custom CSS for chat interface
-            st.markdown('''
-                <style>
-                .chat-message {
-                    padding: 1rem;
-                    border-radius: 4px;
-                    margin-bottom: 1rem;
-                    display: flex;
-                }
-                .chat-message.user {
-                    background-color: #f0f0f0;
-                }
-                .chat-message.bot {
-                    background-color: #e0e0e0;
-                }
-                .chat-message .avatar {
-                    width: 10%;
-                    min-width: 40px;
-                }
-                .chat-message .avatar img {
-                    max-width: 40px;
-                    max-height: 40px;
-                    border-radius: 50%;
-                    object-fit: cover;
-                }
-                .chat-message .message {
-                    width: 90%;
-                    padding: 0 1rem;
-                    color: #333;
-                    line-height: 1.4;
-                }
-                </style>
-            ''', unsafe_allow_html=True)
-            
-            # HTML templates for chat messages
-            bot_template = '''
-            <div class="chat-message bot">
-                <div class="avatar">
-                    <img src="https://i.ibb.co/jMf7sB0/idea.png">
-                </div>
-                <div class="message">{{MSG}}</div>
-            </div>
-            '''
-
-            user_template = '''
-            <div class="chat-message user">
-                <div class="avatar">
-                    <img src="https://i.ibb.co/TcgRhzg/question-mark.png">
-                </div>    
-                <div class="message">{{MSG}}</div>
-            </div>
-            '''
-            
-            # Initialize session state for chat history
-            if "chat_history" not in st.session_state:
-                st.session_state.chat_history = []
-            
-            def load_data():
-                df = pd.read_csv('Mariposa Cocoon OS X.csv')
-                df = df.tail(40)  # Get last 40 lines
-                formatted_data = []
-                for _, row in df.iterrows():
-                    text = f"Date: {row['date']}\nContent: {row['content']}"
-                    if pd.notna(row['source']):
-                        text += f"\nSource: {row['source']}"
-                    if pd.notna(row['user name']):
-                        text += f"\nAuthor: {row['user name']}"
-                    if pd.notna(row['location']):
-                        text += f"\nLocation: {row['location']}"
-                    if pd.notna(row['tags']):
-                        text += f"\nTags: {row['tags']}"
-                    formatted_data.append(text)
-                return "\n\n".join(formatted_data)
-            
-            def get_chatbot_response(user_question, context):
-                llm = ChatOpenAI(
-                    temperature=0.0,
-                    model="gpt-4o-mini",
-                    max_tokens=3000
-                )
-                
-                prompt = f"""You are an expert medical chatbot analyzing data about lung cancer treatments, particularly focusing on EGFR mutations, clinical trials, and drug combinations. The following context contains recent discussions and findings about treatments like amivantamab, lazertinib, osimertinib, and related clinical trials like MARIPOSA.
-
-                When answering questions:
-                1. Focus on identifying specific drugs, their combinations, and treatment outcomes
-                2. Highlight key findings from clinical trials
-                3. Note any reported side effects or toxicity management
-                4. Include relevant survival rates or statistics when available
-                5. Mention the sources or experts cited in the data
-
-                Context:
-                {context}
-
-                Question: {user_question}
-
-                Provide a detailed but clear answer based on the data. If specific information isn't available in the context, explain what related information is available instead of saying you can't find it.
-                """
-                
-                response = llm.predict(prompt)
-                return response
-            
-            def handle_user_input(user_question):
-                context = load_data()
-                response = get_chatbot_response(user_question, context)
-                
-                st.session_state.chat_history.append(("user", user_question))
-                st.session_state.chat_history.append(("bot", response))
-                
-                for role, message in st.session_state.chat_history:
-                    if role == "user":
-                        st.write(user_template.replace("{{MSG}}", message), unsafe_allow_html=True)
-                    else:
-                        st.write(bot_template.replace("{{MSG}}", message), unsafe_allow_html=True)
-            
-            # Text input for user question
-            user_question = st.text_input("Ask a question about Mariposa Cocoon data:")
-            if user_question:
-                handle_user_input(user_question)
-            
-            # Sidebar info
-            with st.sidebar:
-                st.title("Chatbot Info")
-                st.markdown("""
-                This chatbot answers questions about:
-                - EGFR mutations
-                - Clinical trials
-                - Drug combinations
-                - Treatment outcomes
-                - Patient experiences
-                
-                Based on the most recent data from Mariposa Cocoon OS X
-                
-                """)
-                
-                if st.button("Clear Chat"):
-                    st.session_state.chat_history = []
-                    st.rerun()
+        render_tabs({
+            "📈 Engagement": lambda: render_engagement_tab(filtered_df, filter_plan),
+            "📊 Analysis": lambda: render_analysis_tab(
+                filtered_df, filter_plan, sentiment_counts, get_ngram_index(dataset_path)
+            ),
+            "🎧 Podcast": lambda: create_audio_player(dataset_path, get_media_cache()),
+            "🎥 Video": lambda: create_video_player(get_media_cache()),
+            "💬 Chatbot": lambda: render_chatbot_tab(dataset_path),
+        }, keep_state={'phrase_length': (2, 5), 'include_common': False})
 
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.models.data_model import CACHE_DIR, persist
+
+# Posts handed to the chatbot as context
+CONTEXT_POSTS = 40
+# Upper bound on the context handed to the chatbot, in approximate tokens
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('MARIPOSA_CONTEXT_TOKENS', 3000))
+# Optional post fields included in the context, with their labels
+CONTEXT_FIELDS = [('source', 'Source'), ('user name', 'Author'), ('location', 'Location'), ('tags', 'Tags')]
+
+
+def estimate_tokens(texts):
+    """Rough token counts of texts, at about four characters per token"""
+    return pd.Series(texts).str.len().floordiv(4).add(1)
+
+
+def format_posts(posts):
+    """
+    One context block per post with its date (unknown when missing),
+    content and whichever of source, author, location and tags it has.
+    """
+    text = (
+        'Date: ' + posts['date'].dt.strftime('%Y-%m-%d').fillna('unknown')
+        + '\nContent: ' + posts['content'].fillna('').astype(str)
+    )
+    for column, label in CONTEXT_FIELDS:
+        values = posts[column]
+        text = text + (f'\n{label}: ' + values.astype(str)).where(values.notna(), '')
+    return text
+
+
+def build_context(df, n_posts=CONTEXT_POSTS):
+    """Chatbot context of the n_posts most recent posts of a date-ordered frame"""
+    return '\n\n'.join(format_posts(df.tail(n_posts)))
+
+
+def build_question_context(df, index, question, token_budget=CONTEXT_TOKEN_BUDGET, max_posts=CONTEXT_POSTS):
+    """
+    Chatbot context of the posts of df most relevant to question according
+    to index (a BM25Index over df's content hashes), best first, adding
+    posts while they fit in token_budget. Returns None when no post
+    matches the question.
+    """
+    hashes, _ = index.search(question, k=max_posts * 2)
+    if not len(hashes):
+        return None
+
+    # The latest post with each content, skipping indexed contents that left the dataset
+    latest = pd.Series(np.arange(len(df)), index=pd.Index(df['content_hash'].to_numpy(), dtype='uint64'))
+    latest = latest[~latest.index.duplicated(keep='last')]
+    positions = latest.reindex(hashes).dropna().to_numpy(dtype='int64')
+    if not len(positions):
+        return None
+    blocks = format_posts(df.iloc[positions[:max_posts]])
+    fits = np.cumsum(estimate_tokens(blocks).to_numpy() + 1) <= token_budget
+    fits[0] = True  # The best match is always included
+    return '\n\n'.join(blocks[fits])
+
+
+PROMPT_TEMPLATE = """You are an expert medical chatbot analyzing data about lung cancer treatments, particularly focusing on EGFR mutations, clinical trials, and drug combinations. The following context contains recent discussions and findings about treatments like amivantamab, lazertinib, osimertinib, and related clinical trials like MARIPOSA.
+
+When answering questions:
+1. Focus on identifying specific drugs, their combinations, and treatment outcomes
+2. Highlight key findings from clinical trials
+3. Note any reported side effects or toxicity management
+4. Include relevant survival rates or statistics when available
+5. Mention the sources or experts cited in the data
+
+Context:
+{context}
+
+Question: {question}
+
+Provide a detailed but clear answer based on the data. If specific information isn't available in the context, explain what related information is available instead of saying you can't find it.
+"""
+CHAT_MODEL = os.environ.get('MARIPOSA_CHAT_MODEL', 'gpt-4o-mini')
+# 'openai' (any OpenAI-compatible server, see MARIPOSA_LLM_BASE_URL) or 'fake'
+CHAT_BACKEND = os.environ.get('MARIPOSA_LLM_BACKEND', 'openai')
+RESPONSE_CACHE_PATH = os.path.join(CACHE_DIR, 'chat_responses.parquet')
+RESPONSE_TTL_SECONDS = int(os.environ.get('MARIPOSA_RESPONSE_TTL_SECONDS', 7 * 24 * 3600))
+RESPONSE_CACHE_ENTRIES = int(os.environ.get('MARIPOSA_RESPONSE_CACHE_ENTRIES', 1000))
+
+
+class OpenAIBackend:
+    """
+    Chat model behind the OpenAI API, or any compatible server at
+    base_url. The LangChain client is created once and reused, so its
+    connection pool is shared by every question.
+    """
+
+    def __init__(self, model=CHAT_MODEL, temperature=0.0, max_tokens=3000, base_url=None):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.base_url = base_url or os.environ.get('MARIPOSA_LLM_BASE_URL')
+        self._lock = threading.Lock()
+        self._llm = None
+
+    def _client(self):
+        with self._lock:
+            if self._llm is None:
+                # Deferred so LangChain is only imported once someone asks a question
+                from langchain_openai import ChatOpenAI
+
+                self._llm = ChatOpenAI(
+                    temperature=self.temperature,
+                    model=self.model,
+                    max_tokens=self.max_tokens,
+                    base_url=self.base_url
+                )
+            return self._llm
+
+    def complete(self, prompt):
+        return self._client().invoke(prompt).content
+
+
+class FakeBackend:
+    """Stand-in model for tests and offline use, answering with a canned reply"""
+
+    def __init__(self, model='fake', reply="Fake answer to: {question}"):
+        self.model = model
+        self.reply = reply
+        self.prompts = []
+
+    def complete(self, prompt):
+        self.prompts.append(prompt)
+        question = prompt.rsplit('Question: ', 1)[-1].split('\n', 1)[0]
+        return self.reply.format(question=question)
+
+
+def create_backend(name=CHAT_BACKEND, **options):
+    """Chat backend by name, 'openai' or 'fake'"""
+    backends = {'openai': OpenAIBackend, 'fake': FakeBackend}
+    if name not in backends:
+        raise ValueError(f"Unknown chat backend {name!r}, expected one of {', '.join(backends)}")
+    return backends[name](**options)
+
+
+def _digest(*parts):
+    return hashlib.sha1('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Chatbot answers persisted as Parquet, keyed by a hash of the model,
+    prompt template, normalized question and context. Entries expire
+    after ttl seconds, and beyond max_entries the least recently used
+    are dropped.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl=RESPONSE_TTL_SECONDS, max_entries=RESPONSE_CACHE_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # Held while writing, so writes land in snapshot order
+        self._entries = self._load()  # key -> [response, created, last_used], least recently used first
+        self._version = 0  # Bumped by every put
+        self._saved_version = 0
+
+    def _load(self):
+        entries = OrderedDict()
+        if self.path is None or not os.path.exists(self.path):
+            return entries
+        try:
+            stored = pd.read_parquet(self.path).sort_values('last_used')
+        except (OSError, ValueError):
+            return entries  # Unreadable cache, answers get fetched again
+        for key, response, created, last_used in stored[['key', 'response', 'created', 'last_used']].itertuples(index=False):
+            entries[key] = [response, created, last_used]
+        return entries
+
+    def save(self):
+        """
+        Atomically write a snapshot of the cache to disk, returning False
+        on a read-only filesystem. Lookups only wait for the snapshot, not
+        for the write, and a snapshot already written by a concurrent
+        save is not written again.
+        """
+        with self._save_lock:
+            with self._lock:
+                if self._saved_version == self._version:
+                    return True
+                version = self._version
+                rows = [(key, *entry) for key, entry in self._entries.items()]
+            frame = pd.DataFrame(rows, columns=['key', 'response', 'created', 'last_used'])
+            saved = persist(self.path, lambda tmp_path: frame.to_parquet(tmp_path, index=False))
+            if saved:
+                self._saved_version = version
+            return saved
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(model, template, question, context):
+        """Cache key of an answer"""
+        question = ' '.join(question.split()).casefold()
+        return _digest(model, _digest(template), question, _digest(context))
+
+    def get(self, key):
+        """The cached answer for key, or None when missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[1] > self.ttl:
+                del self._entries[key]
+                return None
+            entry[2] = now
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = [response, now, now]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._version += 1
+        if self.path is not None:
+            self.save()
+
+
+class ChatClient:
+    """
+    Answers questions about a context through a backend, serving repeated
+    questions over the same context from a response cache.
+    """
+
+    def __init__(self, backend=None, cache=None, template=PROMPT_TEMPLATE):
+        self.backend = backend if backend is not None else create_backend()
+        self.cache = cache if cache is not None else ResponseCache()
+        self.template = template
+
+    def ask(self, question, context):
+        """Return (answer, cached)"""
+        key = self.cache.key(self.backend.model, self.template, question, context)
+        response = self.cache.get(key)
+        if response is not None:
+            return response, True
+        response = self.backend.complete(self.template.format(context=context, question=question))
+        self.cache.put(key, response)
+        return response, False
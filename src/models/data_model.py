@@ -1,45 +1,561 @@
+import glob
+import hashlib
+import heapq
+import io
+import json
+import os
 import re
-import ssl
-from collections import Counter
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import chain, islice
 
-import nltk
+import numpy as np
 import pandas as pd
-from nltk.corpus import stopwords
-from nltk.util import ngrams
-from textblob import TextBlob
 
-try:
-    _create_unverified_https_context = ssl._create_unverified_context
-except AttributeError:
-    pass
-else:
-    ssl._create_default_https_context = _create_unverified_https_context
+DEFAULT_DATASET = 'Mariposa Cocoon OS X.csv'
+CACHE_DIR = os.environ.get('MARIPOSA_CACHE_DIR', '.cache')
+NUMERIC_COLUMNS = ['replies', 'reposts', 'likes', 'views', 'followers']
+CATEGORICAL_COLUMNS = ['source', 'user name', 'handle', 'location', 'country', 'tags']
+# Uniquely identifies a post, repeated rows of a link are engagement snapshots of one post
+LINK_COLUMN = 'link'
+# Rows per chunk for chunked ingestion, which bounds its peak memory
+CHUNK_SIZE = int(os.environ.get('MARIPOSA_CHUNK_SIZE', 100_000))
+CHUNKED_INGEST_BYTES = int(os.environ.get('MARIPOSA_CHUNKED_INGEST_BYTES', 64 * 1024 * 1024))
+# Bump when the processed layout changes so older cache files are ignored
+CACHE_VERSION = 5
+SENTIMENT_LABELS = ['Positive', 'Neutral', 'Negative']
+# NLTK's English stopword list, bundled so startup never needs the network
+STOPWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stopwords_english.txt')
 
-# Download stopwords if they're not already downloaded
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+def dataset_fingerprint(filepath):
+    """Identify a source file by absolute path, modification time and size"""
+    stat = os.stat(filepath)
+    return os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size
 
-def load_and_process_data(filepath='Mariposa Cocoon OS X.csv'):
+def cache_stem(filepath):
+    """Readable name of a source file in CACHE_DIR, made unique by a hash of its absolute path"""
+    path = os.path.abspath(filepath)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+
+def _cache_file(fingerprint, suffix='.parquet'):
+    """Path of the columnar cache file belonging to a dataset fingerprint"""
+    path, mtime_ns, size = fingerprint
+    version_key = hashlib.sha1(f"{mtime_ns}:{size}:{CACHE_VERSION}".encode('utf-8')).hexdigest()[:8]
+    return os.path.join(CACHE_DIR, f"{cache_stem(path)}-{version_key}{suffix}")
+
+def atomic_write(path, write):
     """
-    Loads and processes the CSV data, converting date strings to datetime
-    and handling numeric columns appropriately.
+    Write a file through write(tmp_path) into a temporary file next to
+    path, then move it into place, so readers never see a partial file.
+    Raises OSError when the file cannot be written.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def persist(path, write):
+    """
+    atomic_write for caches that also live in memory, returning whether
+    the file was written. On a read-only filesystem the caller simply
+    keeps serving from memory.
+    """
+    try:
+        atomic_write(path, write)
+        return True
+    except OSError:
+        return False
+
+def _remove_stale_caches(cache_path):
+    """Drop cache files of older versions of the same source file"""
+    cache_dir, name = os.path.split(cache_path)
+    prefix, suffix = name.rsplit('-', 1)[0], os.path.splitext(name)[1]
+    for stale in glob.glob(os.path.join(cache_dir, f"{glob.escape(prefix)}-*{suffix}")):
+        if stale != cache_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+def _write_cache(df, cache_path):
+    """Atomically write the processed frame and drop stale versions of it"""
+    if persist(cache_path, lambda tmp_path: df.to_parquet(tmp_path, index=False)):
+        _remove_stale_caches(cache_path)
+
+def _read_cache(cache_path):
+    """Read a cached frame, downcasting counts that chunked ingestion stores as float64"""
+    df = pd.read_parquet(cache_path)
+    for col in NUMERIC_COLUMNS:
+        if df[col].dtype.kind == 'f':
+            df[col] = _compact_counts(df[col])
+    return df
+
+def content_hashes(texts):
+    """Hash post contents to stable 64-bit keys"""
+    texts = pd.Series(texts).fillna('').astype(str)
+    return pd.util.hash_pandas_object(texts, index=False).to_numpy()
+
+def _compact_counts(values):
+    """Downcast whole-number counts to the smallest (unsigned if possible) integer type"""
+    if not (values % 1 == 0).all():
+        return values
+    return pd.to_numeric(values.astype('int64'), downcast='unsigned' if (values >= 0).all() else 'integer')
+
+def apply_schema(df):
+    """
+    Compact dtypes for the posts table: categoricals for the low-cardinality
+    text columns, downcast integers for the counts and Arrow-backed strings
+    for the content. Category codes of 'user name' are the author ids used
+    by the author table.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('category')
+    
+    for col in NUMERIC_COLUMNS:
+        df[col] = _compact_counts(df[col])
+    
+    df['content'] = df['content'].astype('string[pyarrow]')
+    return df
+
+def superseded_posts(link_hashes, has_link=None):
+    """
+    Mask of the rows replaced by a later row with the same link hash, so
+    only the latest engagement snapshot of every post is kept. Rows where
+    has_link is False are never treated as duplicates.
+    """
+    superseded = pd.Series(link_hashes, dtype='uint64').duplicated(keep='last').to_numpy()
+    if has_link is not None:
+        superseded = superseded & has_link
+    return superseded
+
+def process_data(df, compact=True, dedup=True):
+    """
+    Converts date strings to datetime, strips thousands separators from
+    the numeric columns of a raw posts frame and orders the posts by date.
+    With compact the columns get the dtypes of apply_schema.
+
+    Links are hashed into a link_hash column. With dedup, repeated links
+    (overlapping exports) keep only their last row in file order, and the
+    number of dropped rows is kept in df.attrs['duplicates_dropped'].
     """
-    df = pd.read_csv(filepath)
     df['date'] = pd.to_datetime(df['date'])
-    numeric_columns = ['replies', 'reposts', 'likes', 'views', 'followers']
     
-    for col in numeric_columns:
+    for col in NUMERIC_COLUMNS:
         df[col] = df[col].astype(str).str.replace(',', '')
     
-    for col in numeric_columns:
+    for col in NUMERIC_COLUMNS:
         df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
     
+    if LINK_COLUMN in df:
+        df['link_hash'] = content_hashes(df[LINK_COLUMN])
+        if dedup:
+            superseded = superseded_posts(df['link_hash'].to_numpy(), df[LINK_COLUMN].notna().to_numpy())
+            df = df[~superseded]
+            df.attrs['duplicates_dropped'] = int(superseded.sum())
+    
+    if compact:
+        df = apply_schema(df)
+    
+    # Date-ordered rows let DateIndex serve date ranges as slices
+    return df.sort_values('date', kind='stable', ignore_index=True)
+
+def memory_report(filepath=DEFAULT_DATASET):
+    """
+    Bytes per column of a dataset before and after apply_schema, with a
+    total row. Returns a DataFrame with before, after and saved columns.
+    """
+    before = process_data(pd.read_csv(filepath), compact=False).memory_usage(deep=True, index=False)
+    after = apply_schema(process_data(pd.read_csv(filepath), compact=False)).memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'before': before, 'after': after})
+    report.loc['total'] = report.sum()
+    report['saved'] = 1 - report['after'] / report['before']
+    return report
+
+def build_author_table(df):
+    """
+    Author dimension of a posts frame, indexed by author id (the category
+    code of 'user name'), with total views, post count and followers.
+    """
+    names = df['user name']
+    if not isinstance(names.dtype, pd.CategoricalDtype):
+        names = names.astype('category')
+    codes = names.cat.codes.to_numpy()
+    known = codes >= 0
+    codes = codes[known]
+    n_authors = len(names.cat.categories)
+    
+    followers = pd.Series(df['followers'].to_numpy()[known]).groupby(codes).max()
+    return pd.DataFrame({
+        'user name': pd.Categorical.from_codes(np.arange(n_authors), dtype=names.dtype),
+        'views': np.bincount(codes, weights=df['views'].to_numpy(dtype='float64')[known], minlength=n_authors).astype('int64'),
+        'posts': np.bincount(codes, minlength=n_authors),
+        'followers': followers.reindex(np.arange(n_authors), fill_value=0).to_numpy()
+    }, index=pd.RangeIndex(n_authors, name='author_id'))
+
+def update_author_table(authors, new_rows):
+    """
+    Fold new posts into an author table. The 'user name' categories of
+    new_rows must extend those of the table, so existing ids stay valid.
+    """
+    delta = build_author_table(new_rows)
+    authors = authors.drop(columns='user name').reindex(delta.index, fill_value=0)
+    authors.insert(0, 'user name', delta['user name'])
+    authors['views'] += delta['views']
+    authors['posts'] += delta['posts']
+    authors['followers'] = np.maximum(authors['followers'], delta['followers'])
+    return authors
+
+class DateIndex:
+    """
+    Date positions of a date-ordered posts frame. Date ranges resolve to
+    row slices with searchsorted, and per-day sums of the numeric columns
+    are precomputed so any window is served from prefix sums. Posts
+    without a date sort last and are left out of every range.
+    """
+
+    def __init__(self, df, columns=NUMERIC_COLUMNS):
+        dated = int(df['date'].notna().sum())
+        if df['date'].iloc[dated:].notna().any() or not df['date'].iloc[:dated].is_monotonic_increasing:
+            raise ValueError("DateIndex needs a frame sorted by date")
+        self.dates = pd.DatetimeIndex(df['date'].iloc[:dated])
+        self.undated = len(df) - dated
+        days = self.dates.to_numpy().astype('datetime64[D]')
+        self.days, day_codes = np.unique(days, return_inverse=True)
+        self.daily_sums = {
+            col: np.bincount(
+                day_codes, weights=df[col].iloc[:dated].to_numpy(dtype='float64'), minlength=len(self.days)
+            ).astype('int64' if df[col].dtype.kind in 'iu' else 'float64')
+            for col in columns
+        }
+        self.prefix_sums = {
+            col: np.concatenate([[0], np.cumsum(sums)]) for col, sums in self.daily_sums.items()
+        }
+
+    @property
+    def first_date(self):
+        return self.dates[0].date()
+
+    @property
+    def last_date(self):
+        return self.dates[-1].date()
+
+    def positions(self, start_date, end_date):
+        """Row slice covering the posts from start_date to end_date inclusive"""
+        start = np.datetime64(start_date, 'D')
+        stop = np.datetime64(end_date, 'D') + np.timedelta64(1, 'D')
+        dates = self.dates.to_numpy()
+        return slice(int(dates.searchsorted(start, 'left')), int(dates.searchsorted(stop, 'left')))
+
+    def _day_slice(self, start_date, end_date):
+        start = np.datetime64(start_date, 'D')
+        end = np.datetime64(end_date, 'D')
+        return slice(int(self.days.searchsorted(start, 'left')), int(self.days.searchsorted(end, 'right')))
+
+    def daily(self, column, start_date, end_date):
+        """Per-day sums of column between two dates, as a frame with date and column"""
+        days = self._day_slice(start_date, end_date)
+        return pd.DataFrame({
+            'date': pd.DatetimeIndex(self.days[days]).date,
+            column: self.daily_sums[column][days]
+        })
+
+    def total(self, column, start_date, end_date):
+        """Sum of column between two dates from the prefix sums"""
+        days = self._day_slice(start_date, end_date)
+        return self.prefix_sums[column][days.stop] - self.prefix_sums[column][days.start]
+
+    def extend(self, new_rows):
+        """
+        Index over the frame with new_rows appended, summing only the new
+        rows. new_rows must be date-ordered, not predate the last post and
+        have no dated posts after undated ones already indexed.
+        """
+        delta = DateIndex(new_rows, columns=list(self.daily_sums))
+        if len(delta.dates) and (self.undated or len(self.dates) and delta.dates[0] < self.dates[-1]):
+            raise ValueError("Appended rows must follow the indexed posts in date order")
+        extended = DateIndex.__new__(DateIndex)
+        extended.dates = self.dates.append(delta.dates)
+        extended.undated = self.undated + delta.undated
+        extended.days = np.union1d(self.days, delta.days)
+        extended.daily_sums = {}
+        for col, sums in self.daily_sums.items():
+            merged = np.zeros(len(extended.days), dtype=np.result_type(sums, delta.daily_sums[col]))
+            merged[extended.days.searchsorted(self.days)] += sums
+            merged[extended.days.searchsorted(delta.days)] += delta.daily_sums[col]
+            extended.daily_sums[col] = merged
+        extended.prefix_sums = {
+            col: np.concatenate([[0], np.cumsum(sums)]) for col, sums in extended.daily_sums.items()
+        }
+        return extended
+
+class DatasetAggregates:
+    """
+    Date index and author table folded in chunk by chunk, for instance
+    from the on_chunk callback of ingest_csv, so neither needs the whole
+    frame. Chunks must share categories (as ingest_csv's do) and arrive in
+    date order; once one does not, date_index is None and has to be built
+    from the sorted frame.
+    """
+
+    def __init__(self):
+        self.date_index = None
+        self.author_table = None
+        self._ordered = True
+
+    def add(self, chunk):
+        rows = chunk[['date', 'user name', *NUMERIC_COLUMNS]].copy()
+        for col in NUMERIC_COLUMNS:
+            rows[col] = _compact_counts(rows[col])
+        if self.author_table is None:
+            self.author_table = build_author_table(rows)
+        else:
+            self.author_table = update_author_table(self.author_table, rows)
+        if self._ordered:
+            try:
+                self.date_index = DateIndex(rows) if self.date_index is None else self.date_index.extend(rows)
+            except ValueError:
+                self.date_index = None
+                self._ordered = False
+
+    def resources(self):
+        """Aggregates built so far, by the registry resource name they stand in for"""
+        resources = {'author_table': self.author_table, 'date_index': self.date_index}
+        return {name: value for name, value in resources.items() if value is not None}
+
+def load_and_process_data(filepath=DEFAULT_DATASET, use_cache=True, chunk_size=None, on_chunk=None):
+    """
+    Loads and processes the CSV data, converting date strings to datetime
+    and handling numeric columns appropriately.
+
+    The processed frame is stored as Parquet under CACHE_DIR, keyed on the
+    file's path, mtime and size, so the CSV is only parsed again after it
+    changes. Files above CHUNKED_INGEST_BYTES, or any file when chunk_size
+    is given, are built into the cache with ingest_csv. on_chunk is called
+    with every processed chunk (the whole frame for small files).
+    """
+    if not use_cache:
+        df = process_data(pd.read_csv(filepath))
+        if on_chunk is not None:
+            on_chunk(df)
+        return df
+    
+    cache_path = _cache_file(dataset_fingerprint(filepath))
+    if os.path.exists(cache_path):
+        try:
+            return _read_cache(cache_path)
+        except (OSError, ValueError):
+            pass  # Corrupt or unreadable cache, rebuild it below
+    
+    if chunk_size or os.path.getsize(filepath) > CHUNKED_INGEST_BYTES:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            ingest_csv(filepath, cache_path, chunk_size or CHUNK_SIZE, on_chunk)
+            _remove_stale_caches(cache_path)
+            return _read_cache(cache_path)
+        except OSError:
+            pass  # Read-only filesystem, fall back to an in-memory load
+    
+    df = process_data(pd.read_csv(filepath))
+    if on_chunk is not None:
+        on_chunk(df)
+    _write_cache(df, cache_path)
     return df
 
+def tail_signature(filepath, offset, length=4096):
+    """Hash of the bytes just before offset, which an append leaves untouched"""
+    with open(filepath, 'rb') as f:
+        f.seek(max(0, offset - length))
+        return hashlib.sha1(f.read(min(offset, length))).hexdigest()
+
+def read_appended_rows(filepath, offset, signature, size):
+    """
+    Processed posts written to filepath between byte offset and size,
+    parsing only those bytes. Returns None unless that range holds whole
+    lines and the file still carries signature (from tail_signature)
+    before offset, i.e. when it was rewritten rather than appended to.
+    Rows written past size are left for the next refresh.
+    """
+    with open(filepath, 'rb') as f:
+        if size < offset or os.fstat(f.fileno()).st_size < size:
+            return None
+        f.seek(max(0, offset - 1))
+        if offset and f.read(1) != b'\n':
+            return None
+        data = f.read(size - offset)
+        if len(data) != size - offset:
+            return None
+    if tail_signature(filepath, offset) != signature or (data and not data.endswith(b'\n')):
+        return None
+    
+    columns = pd.read_csv(filepath, nrows=0).columns
+    if not data.strip():
+        return process_data(pd.DataFrame(columns=columns), compact=False)
+    return process_data(pd.read_csv(io.BytesIO(data), header=None, names=columns), compact=False)
+
+def append_rows(df, new_rows):
+    """
+    Append processed rows to a processed frame. Categories are extended,
+    never reordered, so existing codes and author ids stay valid.
+    Rows of df whose link appears again in new_rows are replaced by the
+    newer snapshot. Returns (frame, start) where start is the position of
+    the first new row, or None when rows were replaced or the new rows
+    predate the frame and it had to be sorted again.
+    """
+    dropped = df.attrs.get('duplicates_dropped', 0) + new_rows.attrs.get('duplicates_dropped', 0)
+    replaced = np.zeros(len(df), dtype=bool)
+    if 'link_hash' in df and 'link_hash' in new_rows:
+        replaced = df['link_hash'].isin(new_rows['link_hash'][new_rows[LINK_COLUMN].notna()]).to_numpy()
+        replaced = replaced & df[LINK_COLUMN].notna().to_numpy()
+    
+    categories = {
+        col: df[col].cat.categories
+        for col in df.columns
+        if isinstance(df[col].dtype, pd.CategoricalDtype)
+    }
+    new_rows = _extend_categories(new_rows, categories)
+    df = df.copy(deep=False)
+    for col, values in categories.items():
+        if col in new_rows and not isinstance(new_rows[col].dtype, pd.CategoricalDtype):
+            new_rows[col] = pd.Categorical(new_rows[col], categories=values)
+        df[col] = df[col].cat.set_categories(categories[col])
+    if 'content' in new_rows:
+        new_rows['content'] = new_rows['content'].astype(df['content'].dtype)
+    
+    merged = pd.concat([df[~replaced] if replaced.any() else df, new_rows[df.columns]], ignore_index=True)
+    for col in NUMERIC_COLUMNS:
+        merged[col] = _compact_counts(merged[col])
+    merged.attrs['duplicates_dropped'] = int(dropped + replaced.sum())
+    
+    if replaced.any():
+        return merged.sort_values('date', kind='stable', ignore_index=True), None
+    if not len(new_rows) or not len(df) or new_rows['date'].iloc[0] >= df['date'].iloc[-1]:
+        return merged, len(df)
+    return merged.sort_values('date', kind='stable', ignore_index=True), None
+
+def _extend_categories(chunk, categories):
+    """
+    Give the categorical columns of a chunk the categories seen so far,
+    extended with its new values, so codes agree across every chunk.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in chunk:
+            known = categories.get(col, pd.Index([], dtype=object))
+            new = pd.Index(chunk[col].dropna().unique()).difference(known, sort=False)
+            categories[col] = known.append(new)
+            chunk[col] = pd.Categorical(chunk[col], categories=categories[col])
+    return chunk
+
+def ingest_csv(filepath, cache_path, chunk_size=CHUNK_SIZE, on_chunk=None):
+    """
+    Stream a posts CSV into a Parquet file in chunks of chunk_size rows, so
+    peak memory is bounded by the chunk size instead of the file size.
+    Every chunk is normalized like process_data, passed to on_chunk (for
+    example to score its sentiment or fold it into DatasetAggregates) and
+    written as one row group.
+
+    Repeated links are dropped as in process_data. A first pass reads only
+    the link column and holds one 64-bit hash per row, so superseded rows
+    are left out of the chunks before on_chunk sees them, and the chunks
+    are exactly the cached rows.
+
+    Exports arrive in date order, in which case every chunk is written as
+    is. Otherwise the file is re-sorted by date once at the end, which
+    needs memory for the whole compact frame.
+    """
+    atomic_write(cache_path, lambda tmp_path: _stream_csv(filepath, tmp_path, chunk_size, on_chunk))
+
+def _latest_snapshots(filepath, chunk_size):
+    """Mask of the rows of a posts CSV kept by link deduplication, or None when it has no links"""
+    if LINK_COLUMN not in pd.read_csv(filepath, nrows=0).columns:
+        return None
+    link_hashes = []
+    has_link = []
+    for links in pd.read_csv(filepath, usecols=[LINK_COLUMN], chunksize=chunk_size, dtype=str):
+        link_hashes.append(content_hashes(links[LINK_COLUMN]))
+        has_link.append(links[LINK_COLUMN].notna().to_numpy())
+    if not link_hashes:
+        return None
+    return ~superseded_posts(np.concatenate(link_hashes), np.concatenate(has_link))
+
+def _ingest_field(field):
+    """
+    Parquet field of a column for the whole file: dictionaries get int32
+    indices, since category counts grow chunk by chunk, and columns that
+    are empty in the first chunk are typed as the strings they were read as.
+    """
+    import pyarrow as pa
+    
+    if pa.types.is_dictionary(field.type):
+        value_type = pa.large_string() if pa.types.is_null(field.type.value_type) else field.type.value_type
+        return pa.field(field.name, pa.dictionary(pa.int32(), value_type))
+    if pa.types.is_null(field.type):
+        return pa.field(field.name, pa.large_string())
+    return field
+
+def _stream_csv(filepath, tmp_path, chunk_size, on_chunk):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    keep = _latest_snapshots(filepath, chunk_size)
+    dropped = 0 if keep is None else int((~keep).sum())
+    categories = {}
+    writer = None
+    schema = None
+    last_date = None
+    ordered = True
+    start = 0
+    
+    try:
+        for chunk in pd.read_csv(filepath, chunksize=chunk_size, dtype=str):
+            if keep is not None:
+                rows = keep[start:start + len(chunk)]
+                start += len(chunk)
+                chunk = chunk[rows]
+                if not len(chunk):
+                    continue
+            chunk = _extend_categories(process_data(chunk, compact=False, dedup=False), categories)
+            for col in NUMERIC_COLUMNS:
+                chunk[col] = chunk[col].astype('float64')  # Downcast once the whole file is known
+            chunk['content'] = chunk['content'].astype('string[pyarrow]')
+            if len(chunk):
+                ordered = ordered and (last_date is None or chunk['date'].iloc[0] >= last_date)
+                last_date = chunk['date'].iloc[-1]
+            
+            if on_chunk is not None:
+                on_chunk(chunk)
+            
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                # pandas restores df.attrs from the PANDAS_ATTRS key
+                attrs = json.dumps({'duplicates_dropped': dropped}).encode('utf-8')
+                schema = pa.schema([
+                    _ingest_field(field) for field in table.schema
+                ], metadata={**table.schema.metadata, b'PANDAS_ATTRS': attrs})
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    if writer is None:
+        # Header-only file
+        process_data(pd.read_csv(filepath)).to_parquet(tmp_path, index=False)
+    elif not ordered:
+        df = pd.read_parquet(tmp_path)
+        df.sort_values('date', kind='stable', ignore_index=True).to_parquet(tmp_path, index=False)
+
 def get_sentiment(text):
     """Calculate sentiment using TextBlob"""
+    from textblob import TextBlob  # Deferred, TextBlob is slow to import
+
     try:
         return TextBlob(str(text)).sentiment.polarity
     except:
@@ -53,114 +569,287 @@ def categorize_sentiment(polarity):
         return 'Negative'
     return 'Neutral'
 
-def analyze_text_content(text, include_common=False):
+def categorize_sentiments(scores):
+    """Vectorized categorize_sentiment, returning a categorical Series"""
+    scores = pd.Series(scores)
+    values = scores.to_numpy(dtype='float64')
+    codes = np.select([values > 0, values < 0], [0, 2], default=1)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=SENTIMENT_LABELS),
+        index=scores.index,
+        name='sentiment'
+    )
+
+def compute_metrics(df):
     """
-    Analyze text content using standard NLP techniques to extract meaningful phrases.
-    Returns a list of tuples (phrase, count, frequency_score, num_words).
+    Compute the headline metrics and the sentiment distribution of a posts
+    frame in one grouped pass. Returns (metrics, sentiment_counts).
     """
-    # Convert to string and lowercase
-    text = str(text).lower()
+    sentiment = df['sentiment']
+    if not isinstance(sentiment.dtype, pd.CategoricalDtype):
+        sentiment = pd.Categorical(sentiment, categories=SENTIMENT_LABELS)
     
-    # Remove URLs and clean text
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text)
-    text = re.sub(r'[^a-z\s]', ' ', text)
+    groups = df.groupby(sentiment, observed=False).agg(
+        posts=('sentiment_score', 'size'),
+        scored=('sentiment_score', 'count'),
+        score=('sentiment_score', 'sum'),
+        views=('views', 'sum'),
+        reposts=('reposts', 'sum'),
+        followers=('followers', 'sum')
+    )
+    totals = groups.sum()
     
-    # Tokenize and clean
-    tokens = [token.strip() for token in text.split() if len(token.strip()) > 2]
+    metrics = {
+        'Total Posts': int(totals['posts']),
+        'Total Views': int(totals['views']),
+        'Total Reposts': int(totals['reposts']),
+        'Total Followers': int(totals['followers']),
+        'Avg. Sentiment': round(totals['score'] / totals['scored'], 2) if totals['scored'] else float('nan')
+    }
     
-    # Get standard stopwords
-    stop_words = set(stopwords.words('english'))
-    if not include_common:
-        stop_words.update(['rt', 'via', 'amp'])  # Minimal social media terms
-    
-    # Filter tokens
-    filtered_tokens = [token for token in tokens if token not in stop_words]
+    sentiment_counts = groups['posts'][groups['posts'] > 0].sort_values(ascending=False, kind='stable')
+    sentiment_counts.index = sentiment_counts.index.astype(str)
+    sentiment_counts.index.name = 'sentiment'
+    return metrics, sentiment_counts.rename('count')
+
+def load_stopwords(path=STOPWORDS_PATH):
+    """Read the bundled stopword list, one word per line"""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+class TextNormalizer:
+    """
+    Stopword sets and compiled patterns shared by every text function.
+    Use get_text_normalizer() to get the process-wide instance.
+    """
+    URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+')
+    NON_WORD_PATTERN = re.compile(r'[^\w\s\']')
+    NON_LETTER_PATTERN = re.compile(r'[^a-z\s]')
+    DIGITS_PATTERN = re.compile(r'\d+')
+    HASHTAG_PATTERN = re.compile(r'#(\w+)')
+    SOCIAL_TERMS = frozenset(['rt', 'via', 'amp'])  # Minimal social media terms
+    COMMON_TERMS = frozenset(['new', 'update'])
+
+    def __init__(self, stop_words=None):
+        base = frozenset(load_stopwords() if stop_words is None else stop_words)
+        # Keyed by include_common
+        self.stop_words = {
+            True: base,
+            False: base | self.SOCIAL_TERMS | self.COMMON_TERMS
+        }
+        self.analysis_stop_words = {
+            True: base,
+            False: base | self.SOCIAL_TERMS
+        }
+
+    def clean(self, text):
+        """Lowercase text and strip URLs, punctuation other than apostrophes, and digits"""
+        text = self.URL_PATTERN.sub('', str(text).lower())
+        text = self.NON_WORD_PATTERN.sub(' ', text)
+        return self.DIGITS_PATTERN.sub('', text)
+
+    def _candidate_tokens(self, text):
+        # Remove leading/trailing apostrophes and very short tokens
+        return [
+            token for token in (raw.strip("'") for raw in self.clean(text).split())
+            if len(token) > 2 and not token.startswith(("'", "#", "@"))
+        ]
+
+    def tokens(self, text, include_common=False):
+        """Phrase tokens of a text, without stopwords"""
+        stop_words = self.stop_words[include_common]
+        return [token for token in self._candidate_tokens(text) if token not in stop_words]
+
+    def token_variants(self, text):
+        """Phrase tokens for include_common False and True, cleaning the text once"""
+        candidates = self._candidate_tokens(text)
+        return tuple(
+            [token for token in candidates if token not in self.stop_words[include_common]]
+            for include_common in (False, True)
+        )
+
+    def normalize_many(self, texts, include_common=False):
+        """Phrase tokens of every text in a batch"""
+        stop_words = self.stop_words[include_common]
+        return [
+            [token for token in self._candidate_tokens(text) if token not in stop_words]
+            for text in texts
+        ]
+
+    def analysis_tokens(self, text, include_common=False):
+        """Letter-only tokens used by analyze_text_content, without stopwords"""
+        text = self.URL_PATTERN.sub('', str(text).lower())
+        text = self.NON_LETTER_PATTERN.sub(' ', text)
+        stop_words = self.analysis_stop_words[include_common]
+        return [token for token in text.split() if len(token) > 2 and token not in stop_words]
+
+    def hashtags(self, text):
+        """Lowercased hashtags of a text, without the leading #"""
+        return self.HASHTAG_PATTERN.findall(text.lower())
+
+    def terms(self, text_input):
+        """Lowercased, non-empty terms of a comma-separated filter input"""
+        return [term.strip().lower() for term in text_input.split(',') if term.strip()]
+
+@lru_cache(maxsize=None)
+def get_text_normalizer():
+    """Process-wide TextNormalizer"""
+    return TextNormalizer()
+
+def encode_tokens(tokens):
+    """
+    Map tokens to integer ids. Ids follow the sorted vocabulary, so comparing
+    id tuples orders phrases exactly like comparing the joined strings.
+    Returns (token_ids, vocabulary).
+    """
+    vocabulary = sorted(set(tokens))
+    lookup = {token: token_id for token_id, token in enumerate(vocabulary)}
+    return [lookup[token] for token in tokens], vocabulary
+
+def decode_ngram(gram, vocabulary):
+    """Turn a tuple of token ids back into its phrase"""
+    return ' '.join(vocabulary[token_id] for token_id in gram)
+
+def count_ngrams(token_ids, min_n=2, max_n=8, counts=None):
+    """
+    Count every n-gram of length min_n..max_n as a tuple of token ids,
+    streaming the windows into a single Counter without building phrase strings.
+    """
+    counts = Counter() if counts is None else counts
+    counts.update(chain.from_iterable(
+        zip(*(islice(token_ids, offset, None) for offset in range(n)))
+        for n in range(min_n, max_n + 1)
+    ))
+    return counts
+
+class _Descending:
+    """Wrapper inverting the order of a value, used to keep the alphabetically last phrase at a heap root"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+def top_ngrams(counts, k=None, min_count=1, min_n=None, max_n=None):
+    """
+    Rank n-grams per length, keeping only the k best of each length in a
+    bounded heap. Grams may be tuples of token ids or of tokens, and can be
+    restricted to lengths min_n..max_n.
+    Returns {n: [(gram, count), ...]} ordered by count, then phrase.
+    """
+    min_n = min_n or 0
+    max_n = max_n or float('inf')
     
-    # Generate n-grams and their frequencies
-    all_phrases = []
-    total_tokens = len(filtered_tokens)
+    if k is None:
+        ranked = defaultdict(list)
+        for gram, count in counts.items():
+            if count >= min_count and min_n <= len(gram) <= max_n:
+                ranked[len(gram)].append((gram, count))
+        for grams in ranked.values():
+            grams.sort(key=lambda item: (-item[1], item[0]))
+        return dict(ranked)
     
-    for n in range(2, 9):
-        n_grams = list(ngrams(filtered_tokens, n))
-        phrase_counts = Counter(' '.join(gram) for gram in n_grams)
-        
-        for phrase, count in phrase_counts.items():
-            words = phrase.split()
-            num_words = len(words)
-            
-            # Calculate frequency score (TF - Term Frequency)
-            frequency_score = count / total_tokens if total_tokens > 0 else 0
-            
-            all_phrases.append((phrase, count, frequency_score, num_words))
+    # Min-heaps whose root is the weakest kept n-gram: lowest count, and for
+    # equal counts the last phrase in alphabetical order
+    heaps = defaultdict(list)
+    for gram, count in counts.items():
+        if count < min_count or not min_n <= len(gram) <= max_n:
+            continue
+        heap = heaps[len(gram)]
+        if len(heap) < k:
+            heapq.heappush(heap, (count, _Descending(gram)))
+        elif count >= heap[0][0]:
+            heapq.heappushpop(heap, (count, _Descending(gram)))
     
-    # Sort by count (frequency) first, then by frequency_score
-    return sorted(all_phrases, key=lambda x: (-x[1], -x[2]))
+    return {
+        n: [(entry.value, count) for count, entry in sorted(heap, key=lambda item: (-item[0], item[1].value))]
+        for n, heap in heaps.items()
+    }
 
-def get_word_frequency(text, include_common=False, min_words=2, max_words=5):
+def analyze_text_content(text, include_common=False, top_k=None):
     """
-    Get word frequencies filtered by word count and minimum frequency threshold.
-    Returns a Counter object with significant phrases.
+    Analyze text content using standard NLP techniques to extract meaningful phrases.
+    Returns a list of tuples (phrase, count, frequency_score, num_words).
+    With top_k only the top_k phrases of each length are returned.
     """
-    # Ensure text is a string and clean it
-    text = str(text).lower()
-    
-    # Remove URLs
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text)
+    # Clean, tokenize and drop stopwords
+    filtered_tokens = get_text_normalizer().analysis_tokens(text, include_common)
     
-    # Remove special characters but keep apostrophes for contractions
-    text = re.sub(r'[^\w\s\']', ' ', text)
+    # Count n-grams over token ids and only decode the phrases we return
+    token_ids, vocabulary = encode_tokens(filtered_tokens)
+    counts = count_ngrams(token_ids, 2, 8)
+    if top_k is None:
+        ranked = counts.items()
+    else:
+        ranked = chain.from_iterable(top_ngrams(counts, top_k).values())
     
-    # Remove numbers and extra whitespace
-    text = re.sub(r'\d+', '', text)
-    text = ' '.join(text.split())
+    total_tokens = len(filtered_tokens)
+    all_phrases = [
+        # Frequency score is the term frequency of the phrase
+        (decode_ngram(gram, vocabulary), count, count / total_tokens if total_tokens > 0 else 0, len(gram))
+        for gram, count in ranked
+    ]
     
-    if not text.strip():
-        return Counter()
+    # Sort by count (frequency) first, then by frequency_score
+    return sorted(all_phrases, key=lambda x: (-x[1], -x[2]))
+
+def tokenize_phrase_text(text, include_common=False):
+    """
+    Clean text and return the stopword-filtered tokens used for phrase counting.
+    """
+    return get_text_normalizer().tokens(text, include_common)
+
+def phrase_frequency(tokens, min_words=2, max_words=5, top_k=None):
+    """
+    Count phrases of min_words..max_words tokens seen at least twice.
+    Returns a Counter sorted by frequency then phrase, limited to the top_k
+    phrases of each length when top_k is given.
+    """
+    # Count n-grams within word range over token ids
+    token_ids, vocabulary = encode_tokens(tokens)
+    counts = count_ngrams(token_ids, min_words, max_words)
     
-    # Get stopwords
-    stop_words = set(stopwords.words('english'))
-    if not include_common:
-        stop_words.update(['rt', 'via', 'amp', 'new', 'update'])
-    
-    # Tokenize and clean
-    tokens = []
-    for token in text.split():
-        token = token.strip("'")  # Remove leading/trailing apostrophes
-        if (len(token) > 2 and 
-            token not in stop_words and 
-            not token.startswith(("'", "#", "@"))):
-            tokens.append(token)
-    
-    # Generate n-grams within word range
-    phrases = []
-    for n in range(min_words, max_words + 1):
-        if n <= len(tokens):
-            n_grams = ngrams(tokens, n)
-            phrases.extend(' '.join(gram) for gram in n_grams)
-    
-    # Count frequencies and filter
-    phrase_counts = Counter(phrases)
+    # Keep phrases seen at least twice, sorted by frequency then phrase
     min_freq = 2
-    
-    # Sort by frequency and return top phrases
-    return Counter(dict(sorted(
-        {phrase: count for phrase, count in phrase_counts.items() 
-         if count >= min_freq}.items(),
-        key=lambda x: (-x[1], x[0])
-    )))
+    winners = sorted(
+        chain.from_iterable(top_ngrams(counts, top_k, min_count=min_freq).values()),
+        key=lambda item: (-item[1], item[0])
+    )
+    return Counter({decode_ngram(gram, vocabulary): count for gram, count in winners})
+
+def get_word_frequency(text, include_common=False, min_words=2, max_words=5, top_k=None):
+    """
+    Get word frequencies filtered by word count and minimum frequency threshold.
+    Returns a Counter object with significant phrases, limited to the top_k
+    phrases of each length when top_k is given.
+    """
+    tokens = tokenize_phrase_text(text, include_common)
+    if not tokens:
+        return Counter()
+    return phrase_frequency(tokens, min_words, max_words, top_k)
 
 def get_hashtag_frequency(texts):
     """Extract and count hashtags from texts"""
-    hashtag_pattern = r'#(\w+)'
-    hashtags = []
+    normalizer = get_text_normalizer()
+    hashtags = Counter()
     
     for text in texts:
         if isinstance(text, str):
-            hashtags.extend(re.findall(hashtag_pattern, text.lower()))
+            hashtags.update(normalizer.hashtags(text))
     
-    return Counter(hashtags)
+    return hashtags
 
 def get_location_counts(df):
     """Count posts by location"""
-    locations = df['location'].fillna('Unknown')
-    return locations.value_counts()
+    locations = df['location']
+    if isinstance(locations.dtype, pd.CategoricalDtype) and 'Unknown' not in locations.cat.categories:
+        locations = locations.cat.add_categories('Unknown')
+    counts = locations.fillna('Unknown').value_counts()
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(str)
+    return counts
@@ -0,0 +1,185 @@
+import glob
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from src.models.data_model import DEFAULT_DATASET, dataset_fingerprint, tail_signature
+
+DATA_DIR = os.environ.get('MARIPOSA_DATA_DIR', '.')
+# Memory the loaded datasets may take together before the least recently used are dropped
+MEMORY_BUDGET = int(os.environ.get('MARIPOSA_MEMORY_BUDGET_MB', 1024)) * 1024 * 1024
+# Datasets nobody asked for in this long are dropped on the next access
+IDLE_SECONDS = int(os.environ.get('MARIPOSA_IDLE_SECONDS', 30 * 60))
+
+
+def discover_datasets(data_dir=DATA_DIR):
+    """
+    Return {name: path} for every posts CSV in data_dir, the default
+    dataset first and the others by name.
+    """
+    paths = sorted(glob.glob(os.path.join(glob.escape(data_dir), '*.csv')))
+    paths.sort(key=lambda path: os.path.basename(path) != DEFAULT_DATASET)
+    return {os.path.splitext(os.path.basename(path))[0]: path for path in paths}
+
+
+class _Entry:
+    def __init__(self, fingerprint, df, resources=None):
+        self.fingerprint = fingerprint
+        # Bytes before the loaded size, which an append to the file leaves untouched
+        self.signature = tail_signature(fingerprint[0], fingerprint[2])
+        self.df = df
+        self.df_nbytes = int(df.memory_usage(deep=True).sum())
+        self.resources = dict(resources or {})
+        self.extenders = {}
+        self.building = {}  # resource name -> lock held while it is built
+        self.last_used = time.monotonic()
+
+    @property
+    def nbytes(self):
+        """Memory of the frame and of the resources reporting an nbytes, such as caches filled on demand"""
+        return self.df_nbytes + sum(_resource_nbytes(resource) for resource in self.resources.values())
+
+
+def _resource_nbytes(resource):
+    if isinstance(resource, str):
+        return sys.getsizeof(resource)  # Built contexts, such as the chat context
+    return getattr(resource, 'nbytes', 0)
+
+
+class DatasetRegistry:
+    """
+    Processed datasets loaded on first use and shared by every session,
+    together with the indexes built over them. loader(filepath) returns
+    the frame, or (frame, resources) with resources already built while
+    loading, by name. Entries are kept in least recently used order; once
+    their frames and resources (strings and those reporting nbytes)
+    exceed memory_budget, or an entry sits idle for idle_seconds, it is
+    dropped along with its resources. The dataset in use is never dropped, and a changed source
+    file is loaded again.
+
+    Loads and builds run outside the registry lock, so sessions reading
+    other datasets never wait for them. A per-dataset (and per-resource)
+    lock makes concurrent requests for the same one wait for a single
+    load instead of repeating it.
+
+    With an appender, a file that only grew is refreshed instead:
+    appender(df, filepath, offset, signature, size) parses what was
+    written between byte offset and the fingerprinted size and returns (frame, start) as append_rows does, or
+    None to fall back to a full load. Resources registered with an
+    extender are then extended with the new rows instead of rebuilt.
+    """
+
+    def __init__(self, loader, appender=None, memory_budget=MEMORY_BUDGET, idle_seconds=IDLE_SECONDS):
+        self.loader = loader
+        self.appender = appender
+        self.memory_budget = memory_budget
+        self.idle_seconds = idle_seconds
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # absolute path -> _Entry
+        self._loading = {}  # absolute path -> lock held while the dataset is loaded or refreshed
+
+    def __contains__(self, filepath):
+        return os.path.abspath(filepath) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        """Memory taken by the loaded frames and their resources"""
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def _current(self, key, fingerprint):
+        """The loaded entry of key if it matches fingerprint, marked as used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.fingerprint != fingerprint:
+                return None
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(key)
+            self._evict()
+            return entry
+
+    def _entry(self, filepath):
+        fingerprint = dataset_fingerprint(filepath)
+        key = fingerprint[0]
+        entry = self._current(key, fingerprint)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            # Another session may have loaded it while this one waited
+            entry = self._current(key, fingerprint)
+            if entry is not None:
+                return entry
+            with self._lock:
+                stale = self._entries.get(key)
+            entry = self._refresh(stale, fingerprint) if stale is not None else None
+            if entry is None:
+                loaded = self.loader(filepath)
+                entry = _Entry(fingerprint, *loaded) if isinstance(loaded, tuple) else _Entry(fingerprint, loaded)
+            with self._lock:
+                self._entries.pop(key, None)
+                self._entries[key] = entry
+                self._evict()
+            return entry
+
+    def _refresh(self, entry, fingerprint):
+        """Entry with the rows appended since entry was loaded, or None when a full load is needed"""
+        if self.appender is None:
+            return None
+        appended = self.appender(entry.df, fingerprint[0], entry.fingerprint[2], entry.signature, fingerprint[2])
+        if appended is None:
+            return None
+        df, start = appended
+        refreshed = _Entry(fingerprint, df)
+        if start is not None:
+            with self._lock:
+                extenders = [(name, extend, entry.resources[name]) for name, extend in entry.extenders.items()]
+            for name, extend, resource in extenders:
+                refreshed.resources[name] = extend(resource, df, start)
+                refreshed.extenders[name] = extend
+        return refreshed
+
+    def _evict(self):
+        now = time.monotonic()
+        for key, entry in list(self._entries.items())[:-1]:
+            if now - entry.last_used > self.idle_seconds:
+                del self._entries[key]
+        while len(self._entries) > 1 and self.nbytes > self.memory_budget:
+            self._entries.popitem(last=False)
+
+    def get(self, filepath):
+        """Return the processed dataset for the current version of filepath"""
+        return self._entry(filepath).df
+
+    def resource(self, filepath, name, build, extend=None):
+        """
+        Return a resource derived from a dataset, such as an index, calling
+        build(df) the first time it is asked for. After rows are appended
+        the resource becomes extend(resource, df, start), with start the
+        position of the first new row, or is built again without extend.
+        Resources are dropped with their dataset.
+        """
+        entry = self._entry(filepath)
+        with self._lock:
+            building = entry.building.setdefault(name, threading.Lock())
+        if name not in entry.resources:
+            with building:
+                if name not in entry.resources:
+                    resource = build(entry.df)
+                    with self._lock:
+                        entry.resources[name] = resource
+        with self._lock:
+            if extend is not None:
+                entry.extenders.setdefault(name, extend)
+            return entry.resources[name]
+
+    def evict(self, filepath):
+        """Drop a dataset and its resources"""
+        with self._lock:
+            self._entries.pop(os.path.abspath(filepath), None)
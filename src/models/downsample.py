@@ -0,0 +1,106 @@
+import numpy as np
+
+SAMPLING_METHODS = ['density', 'lttb']
+
+
+def top_positions(values, k):
+    """Positions of the k largest values, in no particular order"""
+    values = np.asarray(values)
+    if k >= len(values):
+        return np.arange(len(values))
+    return np.argpartition(values, len(values) - k)[len(values) - k:]
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets over the points ordered by x. Each
+    bucket keeps the point spanning the largest triangle with the point
+    kept before it and the mean of the next bucket, which preserves the
+    visual shape of the cloud. Returns positions into x.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    order = np.argsort(x, kind='stable')
+    x, y = x[order], y[order]
+    # n_out - 2 buckets between the first and the last point, which are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype('int64')
+    selected = np.empty(n_out, dtype='int64')
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        mean_x, mean_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        area = np.abs(
+            (x[previous] - mean_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (mean_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return order[selected]
+
+
+def density_sample(x, y, n_out, bins=64, seed=0):
+    """
+    Thin the points where they are dense. Points fall into a bins x bins
+    grid over log-scaled x and y, and every cell keeps at most the same
+    number of randomly chosen points, so sparse regions are kept whole
+    and crowded ones are capped. Returns positions into x.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+
+    cells = np.zeros(n, dtype='int64')
+    for values in (x, y):
+        scaled = np.log1p(np.clip(np.asarray(values, dtype='float64'), 0, None))
+        span = scaled.max() - scaled.min()
+        binned = np.zeros(n, dtype='int64') if span == 0 else ((scaled - scaled.min()) / span * (bins - 1)).astype('int64')
+        cells = cells * bins + binned
+
+    _, cell_codes, counts = np.unique(cells, return_inverse=True, return_counts=True)
+    # Largest per-cell cap that keeps the total within n_out (at least one point per cell)
+    low, high = 1, int(counts.max())
+    while low < high:
+        cap = (low + high + 1) // 2
+        if np.minimum(counts, cap).sum() <= n_out:
+            low = cap
+        else:
+            high = cap - 1
+    cap = low
+
+    # Rank every point within its cell in random order and keep ranks below the cap
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(n), cell_codes))
+    cell_starts = np.concatenate([[0], np.cumsum(counts)])[:-1]
+    ranks = np.empty(n, dtype='int64')
+    ranks[order] = np.arange(n) - cell_starts[cell_codes[order]]
+    kept = np.flatnonzero(ranks < cap)
+    if len(kept) > n_out:
+        # More occupied cells than points to keep
+        kept = np.sort(rng.choice(kept, n_out, replace=False))
+    return kept
+
+
+def sample_points(x, y, max_points, method='density', keep_top=100):
+    """
+    Positions of at most about max_points points to plot, chosen with
+    method ('density' or 'lttb'). The keep_top points with the highest x
+    and the highest y are always included, so engagement outliers never
+    disappear. Returns sorted positions.
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    outliers = np.union1d(top_positions(x, keep_top), top_positions(y, keep_top))
+    budget = max(max_points - len(outliers), 3)
+    if method == 'lttb':
+        sampled = lttb(x, y, budget)
+    else:
+        sampled = density_sample(x, y, budget)
+    return np.union1d(sampled, outliers)
@@ -0,0 +1,109 @@
+import weakref
+
+import numpy as np
+
+
+class MaskCache:
+    """
+    Last boolean mask of every predicate (and last value of every memo),
+    kept between reruns. Entries are dropped as soon as the plan runs
+    against a different dataset.
+    """
+
+    def __init__(self):
+        self._dataset = None
+        self._masks = {}  # predicate name -> (params, mask)
+
+    def bind(self, df):
+        """Reset the cache unless it already belongs to df"""
+        if self._dataset is None or self._dataset() is not df:
+            self._dataset = weakref.ref(df)
+            self._masks = {}
+
+    def get(self, name, params):
+        entry = self._masks.get(name)
+        if entry is not None and entry[0] == params:
+            return entry[1]
+        return None
+
+    def put(self, name, params, mask):
+        self._masks[name] = (params, mask)
+
+
+class FilterPlan:
+    """
+    Filters collected as predicates over the full dataset. Each predicate
+    yields a boolean mask (reused from the cache while its parameters are
+    unchanged), the masks are combined with a logical and, and the frame
+    is sliced once at the end. A row range set with restrict, such as a
+    date window of a date-ordered frame, narrows the plan to a slice.
+    """
+
+    def __init__(self, df, mask_cache=None):
+        self.df = df
+        self.mask_cache = mask_cache if mask_cache is not None else MaskCache()
+        self.mask_cache.bind(df)
+        self._rows = slice(0, len(df))
+        self._mask = np.ones(len(df), dtype=bool)
+        self._predicates = []  # (name, params) of every predicate added
+
+    def restrict(self, rows):
+        """Limit the plan to a slice of row positions"""
+        start = max(rows.start, self._rows.start)
+        stop = max(start, min(rows.stop, self._rows.stop))
+        offset = self._rows.start
+        self._mask = self._mask[start - offset:stop - offset]
+        self._rows = slice(start, stop)
+        return self
+
+    def add(self, name, params, predicate):
+        """
+        Add a predicate. params must be hashable and fully describe it;
+        predicate(df) returns a boolean array over every row of df.
+        """
+        mask = self.mask_cache.get(name, params)
+        if mask is None:
+            mask = np.asarray(predicate(self.df), dtype=bool)
+            self.mask_cache.put(name, params, mask)
+        self._mask = self._mask & mask[self._rows]
+        self._predicates.append((name, params))
+        return self
+
+    @property
+    def mask(self):
+        """Combined mask of the predicates added so far, over every row of the dataset"""
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[self._rows] = self._mask
+        return mask
+
+    def column(self, column):
+        """Values of one column for the rows passing the predicates added so far"""
+        return self.df[column].iloc[self._rows][self._mask]
+
+    @property
+    def key(self):
+        """Hashable description of the selection, equal for plans selecting the same rows"""
+        return self._rows.start, self._rows.stop, tuple(self._predicates)
+
+    @property
+    def rows(self):
+        """Slice of row positions the plan is restricted to"""
+        return self._rows
+
+    def memo(self, name, params, compute):
+        """Reuse the last value of compute() while params are unchanged"""
+        value = self.mask_cache.get(name, params)
+        if value is None:
+            value = compute()
+            self.mask_cache.put(name, params, value)
+        return value
+
+    def count(self):
+        return int(self._mask.sum())
+
+    def apply(self):
+        """Slice the dataset once, without copying when only the row range applies"""
+        rows = self.df.iloc[self._rows]
+        if self._mask.all():
+            return rows
+        return rows[self._mask]
@@ -0,0 +1,63 @@
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+# Base URL of a static server (or Streamlit's app/static route) hosting the media files
+MEDIA_BASE_URL = os.environ.get('MARIPOSA_MEDIA_BASE_URL')
+# Memory the shared media cache may hold
+MEDIA_CACHE_BYTES = int(os.environ.get('MARIPOSA_MEDIA_CACHE_MB', 256)) * 1024 * 1024
+
+
+def media_source(path, media_cache, base_url=MEDIA_BASE_URL):
+    """
+    What to hand st.audio/st.video for a media file: a URL under
+    base_url when one is configured, so browsers fetch it with range
+    requests without going through the app, otherwise its contents from
+    media_cache. Streamlit reads and keeps a copy of any file path it is
+    given on every rerun, while the cached bytes are the same object each
+    time, so its media storage holds them once. Files too large for the
+    cache are still read on every rerun; serve those from base_url.
+    """
+    if base_url:
+        return f"{base_url.rstrip('/')}/{quote(os.path.basename(path))}"
+    return media_cache.read(path)
+
+
+class MediaCache:
+    """
+    Media file contents shared by every session, keyed by path, mtime and
+    size and dropped in least recently used order beyond max_bytes. Files
+    larger than a quarter of the budget are read from disk on every call
+    instead of being cached.
+    """
+
+    def __init__(self, max_bytes=MEDIA_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files = OrderedDict()  # (path, mtime_ns, size) -> bytes
+
+    @property
+    def nbytes(self):
+        return sum(len(data) for data in self._files.values())
+
+    def read(self, path):
+        """Return the contents of path"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            data = self._files.get(key)
+            if data is not None:
+                self._files.move_to_end(key)
+                return data
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) > self.max_bytes // 4:
+            return data
+
+        with self._lock:
+            self._files[key] = data
+            while self.nbytes > self.max_bytes:
+                self._files.popitem(last=False)
+        return data
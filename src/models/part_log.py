@@ -0,0 +1,80 @@
+import glob
+import os
+import uuid
+
+from src.models.data_model import persist
+
+
+class PartLog:
+    """
+    Append-only cache kept as part files in a directory and mirrored in
+    memory. An append writes only its own rows, merged with the newest
+    parts while those are less than twice as large as the merged rows.
+    Parts therefore shrink geometrically, a cache of n rows spans
+    O(log n) files, and a row is rewritten O(log n) times.
+
+    read(path) loads a part, write(part, tmp_path) stores one and
+    merge(parts) combines parts given oldest first. len(part) is its
+    number of rows.
+    """
+
+    def __init__(self, directory, read, write, merge, suffix='.parquet'):
+        self.directory = directory
+        self.read = read
+        self.write = write
+        self.merge = merge
+        self.suffix = suffix
+        self.parts = []
+        self._paths = []  # File of every part, None when it only lives in memory
+        self._seq = 0
+        self._load()
+
+    def _load(self):
+        if self.directory is None:
+            return
+        for path in sorted(glob.glob(os.path.join(glob.escape(self.directory), f"part-*{self.suffix}"))):
+            self._seq = max(self._seq, int(os.path.basename(path).split('-')[1]))
+            try:
+                part = self.read(path)
+            except (OSError, ValueError, KeyError):
+                # Unreadable or outdated part, its rows get rebuilt on demand
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            self.parts.append(part)
+            self._paths.append(path)
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def append(self, part):
+        """Add a part of new rows, returning the part it ended up in"""
+        merged = [part]
+        rows = len(part)
+        stale = []
+        while self.parts and len(self.parts[-1]) < 2 * rows:
+            merged.insert(0, self.parts.pop())
+            stale.append(self._paths.pop())
+            rows += len(merged[0])
+        if len(merged) > 1:
+            part = self.merge(merged)
+
+        path = None
+        if self.directory is not None:
+            self._seq += 1
+            # The random suffix keeps processes sharing the directory from overwriting each other
+            path = os.path.join(self.directory, f"part-{self._seq:08d}-{uuid.uuid4().hex[:8]}{self.suffix}")
+            if persist(path, lambda tmp_path: self.write(part, tmp_path)):
+                for stale_path in stale:
+                    if stale_path is not None:
+                        try:
+                            os.remove(stale_path)
+                        except OSError:
+                            pass
+            else:
+                path = None
+        self.parts.append(part)
+        self._paths.append(path)
+        return part
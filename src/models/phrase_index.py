@@ -0,0 +1,190 @@
+import sys
+import threading
+import weakref
+from collections import Counter
+from itertools import chain
+
+import pandas as pd
+
+from src.models.data_model import (
+    count_ngrams,
+    get_text_normalizer,
+    top_ngrams,
+)
+
+MAX_PHRASE_WORDS = 8
+
+
+class TokenCache:
+    """
+    Cleaned, stopword-filtered phrase tokens and hashtags per post, keyed
+    by content hash. Both include_common variants are kept, so changing
+    the phrase length or the common terms toggle never cleans text again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = {}  # content hash -> (without common terms, with common terms, hashtags)
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def _tokenize(self, text):
+        normalizer = get_text_normalizer()
+        return (
+            *(tuple(sys.intern(token) for token in tokens) for tokens in normalizer.token_variants(text)),
+            tuple(sys.intern(hashtag) for hashtag in normalizer.hashtags(text)) if isinstance(text, str) else ()
+        )
+
+    def _entry(self, content_hash, text):
+        entry = self._tokens.get(content_hash)
+        if entry is None:
+            entry = self._tokenize(text)
+            with self._lock:
+                if content_hash not in self._tokens:
+                    self._tokens[content_hash] = entry
+                    # Tokens are interned and shared, so only the tuples and the dict slot count
+                    self.nbytes += sys.getsizeof(entry) + sum(sys.getsizeof(part) for part in entry) + 100
+        return entry
+
+    def tokens_for(self, content_hash, text, include_common=False):
+        """
+        Return the tokens of a single post, tokenizing it on first use.
+        text may be None for a post that was tokenized before.
+        """
+        return self._entry(content_hash, text)[1 if include_common else 0]
+
+    def hashtags_for(self, content_hash, text):
+        """Return the hashtags of a single post, in order of appearance"""
+        return self._entry(content_hash, text)[2]
+
+
+class NgramIndex:
+    """
+    Per-post phrase and hashtag Counters of one dataset, counted from the
+    cached tokens of a post whenever it enters or leaves a selection.
+    Only the tokens are kept, so memory grows with the text of the posts
+    rather than with the number of phrases in them.
+    """
+
+    def __init__(self, token_cache=None):
+        self.token_cache = token_cache if token_cache is not None else TokenCache()
+
+    @property
+    def nbytes(self):
+        return self.token_cache.nbytes
+
+    def phrase_counts(self, content_hash, text, include_common=False, min_n=2, max_n=MAX_PHRASE_WORDS):
+        """Counter of every min_n..max_n word phrase in a post, as token tuples"""
+        return count_ngrams(self.token_cache.tokens_for(content_hash, text, include_common), min_n, max_n)
+
+    def hashtag_counts(self, content_hash, text):
+        """Counter of the hashtags in a post"""
+        return Counter(self.token_cache.hashtags_for(content_hash, text))
+
+
+class SelectionCounts:
+    """
+    Running Counter totals over a selection of posts. Moving to a new
+    selection adds the Counters of posts that entered it and subtracts
+    those of posts that left, instead of recounting every post. With
+    distinct=True every key counts once per post, which turns phrase
+    counts into document frequencies.
+    """
+
+    def __init__(self, distinct=False):
+        self.distinct = distinct
+        self._source = None
+        self._params = None
+        self._selection = pd.Series(dtype='int64', index=pd.Index([], dtype='uint64'))
+        self.totals = Counter()
+
+    def bind(self, source, params=None):
+        """Start over unless the totals were counted from source with the same params"""
+        if self._source is None or self._source() is not source or self._params != params:
+            self._source = weakref.ref(source)
+            self._params = params
+            self._selection = self._selection.iloc[:0]
+            self.totals = Counter()
+        return self
+
+    def _add(self, counts, times):
+        totals = self.totals
+        for key, count in counts.items():
+            total = totals.get(key, 0) + (times if self.distinct else count * times)
+            if total:
+                totals[key] = total
+            else:
+                del totals[key]
+
+    def update(self, hashes, texts, counts_for):
+        """
+        Move the totals to the posts identified by hashes. counts_for is
+        called as counts_for(content_hash, text) for posts entering or
+        leaving the selection and must return the same Counter for a post
+        every time. Posts that left are passed text=None, so their counts
+        have to come from a cache such as TokenCache.
+        """
+        selection = pd.Series(hashes, dtype='uint64').value_counts()
+        delta = selection.sub(self._selection, fill_value=0).astype('int64')
+        delta = delta[delta != 0]
+
+        if len(delta) >= len(selection):
+            # Most posts changed, rebuilding is cheaper than diffing
+            self.totals = Counter()
+            delta = selection
+
+        if len(delta):
+            texts = pd.Series(pd.Series(texts).to_numpy(), index=pd.Index(hashes, dtype='uint64'))
+            texts = texts[~texts.index.duplicated()]
+            for content_hash, times in delta.items():
+                self._add(counts_for(content_hash, texts.get(content_hash)), times)
+
+        self._selection = selection
+        return self.totals
+
+
+def phrase_frequency_from_counts(totals, min_words=2, max_words=5, top_k=None, min_count=2):
+    """
+    Same result shape as get_word_frequency, read from phrase totals
+    built with NgramIndex.phrase_counts.
+    """
+    winners = sorted(
+        chain.from_iterable(top_ngrams(totals, top_k, min_count, min_words, max_words).values()),
+        key=lambda item: (-item[1], item[0])
+    )
+    return Counter({' '.join(gram): count for gram, count in winners})
+
+
+def count_document_phrases(documents, include_common=False, min_words=2, max_words=5):
+    """
+    Stream documents and count phrases within each of them, never across
+    two documents. Memory grows with the number of distinct phrases, not
+    with the size of the corpus.
+    Returns (counts, document_counts) as Counters of token tuples.
+    """
+    normalizer = get_text_normalizer()
+    counts = Counter()
+    document_counts = Counter()
+    for document in documents:
+        if not isinstance(document, str):
+            continue
+        document_phrases = count_ngrams(normalizer.tokens(document, include_common), min_words, max_words)
+        counts.update(document_phrases)
+        document_counts.update(document_phrases.keys())
+    return counts, document_counts
+
+
+def analyze_phrases(documents, include_common=False, min_words=2, max_words=5, top_k=None, min_count=2):
+    """
+    Phrase analysis over an iterable of documents.
+    Returns a list of tuples (phrase, count, document_frequency, num_words)
+    sorted by count, then phrase.
+    """
+    counts, document_counts = count_document_phrases(documents, include_common, min_words, max_words)
+    winners = sorted(
+        chain.from_iterable(top_ngrams(counts, top_k, min_count).values()),
+        key=lambda item: (-item[1], item[0])
+    )
+    return [(' '.join(gram), count, document_counts[gram], len(gram)) for gram, count in winners]
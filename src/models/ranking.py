@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def top_order(values, k):
+    """
+    Positions of the k largest values, largest first and ties in position
+    order. Only the top k are sorted; argpartition finds the k-th largest
+    value in linear time. Rows tied with it are taken in position order,
+    so a deeper ranking always extends a shallower one.
+    """
+    values = np.asarray(values)
+    k = min(k, len(values))
+    if k <= 0:
+        return np.arange(0)
+    if k < len(values):
+        threshold = values[np.argpartition(values, len(values) - k)[len(values) - k]]
+        above = np.flatnonzero(values > threshold)
+        tied = np.flatnonzero(values == threshold)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.lexsort((candidates, -values[candidates].astype('float64')))]
+
+
+class TopRanking:
+    """
+    Rows of a selection ranked by a column, largest first, ranked only as
+    deep as requested. Asking for rows past the ranked ones doubles the
+    depth with another partial sort, so paging never sorts the whole
+    selection up front.
+    """
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+        self._order = np.arange(0)
+
+    def __len__(self):
+        return len(self.values)
+
+    def top(self, stop):
+        """Positions of the stop highest ranked rows"""
+        if stop > len(self._order) and len(self._order) < len(self.values):
+            self._order = top_order(self.values, max(stop, 2 * len(self._order)))
+        return self._order[:stop]
+
+    def page(self, number, size):
+        """Positions of the rows on page number (from 0) of size rows"""
+        return self.top((number + 1) * size)[number * size:]
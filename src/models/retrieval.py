@@ -0,0 +1,165 @@
+import os
+import threading
+
+import numpy as np
+
+from src.models.data_model import CACHE_DIR, cache_stem
+from src.models.part_log import PartLog
+
+# Bump when the vectorizer settings change so older index files are rebuilt
+INDEX_VERSION = 1
+N_FEATURES = 2 ** 20
+
+
+def index_path(filepath):
+    """Directory of the on-disk retrieval index of a dataset"""
+    return os.path.join(CACHE_DIR, f"retrieval-{cache_stem(filepath)}")
+
+
+class _Part:
+    """Term counts of a batch of posts, one row per content hash"""
+
+    def __init__(self, hashes, counts):
+        self.hashes = hashes
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+def _read_part(path):
+    import scipy.sparse as sp
+
+    with np.load(path) as stored:
+        if int(stored['version']) != INDEX_VERSION:
+            raise ValueError(f"{path} belongs to another index version")
+        hashes = stored['hashes']
+        counts = sp.csr_matrix((stored['data'], stored['indices'], stored['indptr']), shape=(len(hashes), N_FEATURES))
+    return _Part(hashes, counts)
+
+
+def _write_part(part, tmp_path):
+    # Through a file object, so numpy keeps the temporary name as is
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            version=INDEX_VERSION,
+            hashes=part.hashes,
+            data=part.counts.data,
+            indices=part.counts.indices,
+            indptr=part.counts.indptr
+        )
+
+
+def _merge_parts(parts):
+    import scipy.sparse as sp
+
+    return _Part(np.concatenate([part.hashes for part in parts]), sp.vstack([part.counts for part in parts], format='csr'))
+
+
+class BM25Index:
+    """
+    Okapi BM25 over post contents, keyed by content hash and persisted as
+    sparse term counts in a PartLog. Terms are hashed into N_FEATURES
+    columns, so there is no vocabulary to refit: adding posts tokenizes
+    only their contents and writes them as a new part. Queries are scored
+    locally against the whole index.
+    """
+
+    def __init__(self, path=None, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._vectorizer = None
+        self._columns = None  # Column-major copy of the counts for queries, built on demand
+        self._parts = PartLog(path, _read_part, _write_part, _merge_parts, suffix='.npz')
+        self._load()
+
+    def _load(self):
+        parts = self._parts.parts
+        self.hashes = np.concatenate([part.hashes for part in parts]) if parts else np.zeros(0, dtype='uint64')
+        self.lengths = np.zeros(0, dtype='float32')
+        self.doc_freq = np.zeros(N_FEATURES, dtype='int64')
+        if len(np.unique(self.hashes)) < len(self.hashes):
+            # Another process indexed the same posts, keep their first rows
+            merged = _merge_parts(parts)
+            first = np.zeros(len(self.hashes), dtype=bool)
+            first[np.unique(self.hashes, return_index=True)[1]] = True
+            parts[:] = [_Part(merged.hashes[first], merged.counts[first])]
+            self.hashes = parts[0].hashes
+        for part in parts:
+            self._count(part.counts)
+
+    def _count(self, counts):
+        self.lengths = np.concatenate([self.lengths, np.asarray(counts.sum(axis=1), dtype='float32').ravel()])
+        self.doc_freq = self.doc_freq + np.bincount(counts.indices, minlength=N_FEATURES)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @property
+    def nbytes(self):
+        """Memory of the count parts, the column copy and the per-post arrays"""
+        matrices = [part.counts for part in self._parts.parts]
+        if self._columns is not None:
+            matrices.append(self._columns)
+        return (
+            sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in matrices)
+            + sum(part.hashes.nbytes for part in self._parts.parts)
+            + self.hashes.nbytes + self.lengths.nbytes + self.doc_freq.nbytes
+        )
+
+    def _vectorize(self, texts):
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+
+            self._vectorizer = HashingVectorizer(
+                n_features=N_FEATURES,
+                alternate_sign=False,
+                norm=None,
+                stop_words='english',
+                dtype=np.float32
+            )
+        return self._vectorizer.transform(texts)
+
+    def add(self, hashes, texts):
+        """Index the posts whose content hash is not indexed yet, returning how many were added"""
+        import pandas as pd
+
+        new = pd.Series(pd.Series(texts).fillna('').astype(str).to_numpy(), index=pd.Index(hashes, dtype='uint64'))
+        new = new[~new.index.duplicated() & ~new.index.isin(self.hashes)]
+        if not len(new):
+            return 0
+
+        counts = self._vectorize(new.to_numpy()).tocsr()
+        with self._lock:
+            self._parts.append(_Part(new.index.to_numpy(), counts))
+            self.hashes = np.concatenate([self.hashes, new.index.to_numpy()])
+            self._count(counts)
+            self._columns = None
+        return len(new)
+
+    def search(self, query, k=10):
+        """Content hashes and scores of the k posts best matching query, best first"""
+        terms = np.unique(self._vectorize([query]).indices)
+        with self._lock:
+            if not len(terms) or not len(self.hashes):
+                return self.hashes[:0], np.zeros(0, dtype='float32')
+            if self._columns is None:
+                self._columns = _merge_parts(self._parts.parts).counts.tocsc()
+            n_posts = len(self.hashes)
+            idf = np.log1p((n_posts - self.doc_freq[terms] + 0.5) / (self.doc_freq[terms] + 0.5))
+            matches = self._columns[:, terms].tocoo()
+            length_norm = self.k1 * (1 - self.b + self.b * self.lengths / max(self.lengths.mean(), 1))
+            tf = matches.data
+            weights = idf[matches.col] * tf * (self.k1 + 1) / (tf + length_norm[matches.row])
+            scores = np.bincount(matches.row, weights=weights, minlength=n_posts)
+            hashes = self.hashes
+
+        k = min(k, int((scores > 0).sum()))
+        if not k:
+            return hashes[:0], scores[:0]
+        top = np.argpartition(scores, n_posts - k)[n_posts - k:]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return hashes[top], scores[top]
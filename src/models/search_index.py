@@ -0,0 +1,141 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def _lowercase(values):
+    return values.fillna('').astype(str).str.lower().reset_index(drop=True)
+
+
+def _token_pairs(lower, offset=0):
+    """Distinct (token, row) pairs of lowercase texts, rows counted from offset"""
+    tokens = lower.str.findall(TOKEN_PATTERN).explode().dropna()
+    return pd.DataFrame({
+        'token': tokens.to_numpy(dtype=object),
+        'row': tokens.index.to_numpy(dtype='int64') + offset
+    }).drop_duplicates()
+
+
+class InvertedIndex:
+    """
+    Token to row postings for the post content, built once per dataset.
+    Terms resolve to sorted arrays of row positions, so include/exclude
+    filters become unions and differences of postings instead of regex
+    scans. A lowercase copy of the content serves substring matching and
+    the verification of multi-word terms.
+    """
+
+    def __init__(self, df, column='content'):
+        self.column = column
+        self.labels = df.index
+        self.size = len(df)
+        self.lower = _lowercase(df[column])
+
+        pairs = _token_pairs(self.lower)
+        codes, vocabulary = pd.factorize(pairs['token'])
+        order = np.lexsort((pairs['row'].to_numpy(), codes))
+
+        # Postings in CSR layout: rows of token k are rows[offsets[k]:offsets[k + 1]]
+        self.vocabulary = {token: code for code, token in enumerate(vocabulary)}
+        self.rows = pairs['row'].to_numpy()[order].astype('int32')
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(vocabulary)))])
+        # Counted once, as the registry asks on every access; the vocabulary is left out
+        self.lower_nbytes = int(self.lower.memory_usage(deep=True))
+
+    @property
+    def nbytes(self):
+        return self.lower_nbytes + self.rows.nbytes + self.offsets.nbytes
+
+    def extend(self, df, start):
+        """
+        Index over df, whose rows before position start are the indexed
+        ones. Only the rows from start on are tokenized; their postings
+        are merged into the existing ones.
+        """
+        if start != self.size:
+            raise ValueError("Only rows appended after the indexed ones can be added")
+        new_lower = _lowercase(df[self.column].iloc[start:])
+        pairs = _token_pairs(new_lower, offset=start)
+
+        vocabulary = dict(self.vocabulary)
+        for token in pairs['token'].unique():
+            vocabulary.setdefault(token, len(vocabulary))
+        new_codes = pairs['token'].map(vocabulary).to_numpy(dtype='int64')
+        old_codes = np.repeat(np.arange(len(self.vocabulary)), np.diff(self.offsets))
+
+        # New rows come after every old one, so a stable sort by token keeps postings sorted
+        codes = np.concatenate([old_codes, new_codes])
+        order = np.argsort(codes, kind='stable')
+
+        extended = InvertedIndex.__new__(InvertedIndex)
+        extended.column = self.column
+        extended.labels = df.index
+        extended.size = len(df)
+        extended.lower = pd.concat([self.lower, new_lower], ignore_index=True)
+        extended.vocabulary = vocabulary
+        extended.rows = np.concatenate([self.rows, pairs['row'].to_numpy(dtype='int32')])[order]
+        extended.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(vocabulary)))])
+        extended.lower_nbytes = self.lower_nbytes + int(new_lower.memory_usage(deep=True))
+        return extended
+
+    def postings(self, token):
+        """Sorted row positions of the posts containing token"""
+        code = self.vocabulary.get(token)
+        if code is None:
+            return self.rows[:0]
+        return self.rows[self.offsets[code]:self.offsets[code + 1]]
+
+    def rows_with_term(self, term):
+        """
+        Row positions of the posts containing term as whole words. Terms of
+        several words are narrowed down by their postings and then checked
+        as a literal phrase.
+        """
+        term = term.lower()
+        tokens = TOKEN_PATTERN.findall(term)
+        if not tokens:
+            return np.flatnonzero(self.lower.str.contains(term, regex=False).to_numpy())
+
+        candidates = self.postings(tokens[0])
+        for token in tokens[1:]:
+            candidates = np.intersect1d(candidates, self.postings(token), assume_unique=True)
+        if tokens == [term] or not len(candidates):
+            return candidates
+
+        found = self.lower.iloc[candidates].str.contains(term, regex=False).to_numpy()
+        return candidates[found]
+
+    def match_any(self, terms, substring=False):
+        """Boolean array over every indexed row, True where any of terms occurs"""
+        hits = np.zeros(self.size, dtype=bool)
+        for term in terms:
+            if substring:
+                hits |= self.lower.str.contains(term.lower(), regex=False).to_numpy()
+            else:
+                hits[self.rows_with_term(term)] = True
+        return hits
+
+    def positions(self, df):
+        """Row positions of the rows of df, which must come from the indexed frame"""
+        positions = self.labels.get_indexer(df.index)
+        if (positions < 0).any():
+            raise ValueError("Rows are missing from the search index")
+        return positions
+
+    def mask(self, include=(), exclude=(), substring=False):
+        """Boolean array over every indexed row: any include term and no exclude term"""
+        keep = np.ones(self.size, dtype=bool)
+        if include:
+            keep &= self.match_any(include, substring)
+        if exclude:
+            keep &= ~self.match_any(exclude, substring)
+        return keep
+
+    def filter(self, df, include=(), exclude=(), substring=False):
+        """Keep the rows of df containing any include term and no exclude term"""
+        if not include and not exclude:
+            return df
+        return df[self.mask(include, exclude, substring)[self.positions(df)]]
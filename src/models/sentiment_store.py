@@ -0,0 +1,113 @@
+import argparse
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.models.data_model import (
+    CACHE_DIR,
+    content_hashes,
+    get_sentiment,
+    load_and_process_data,
+)
+from src.models.part_log import PartLog
+
+# Directory of the store's Parquet parts
+SENTIMENT_STORE_PATH = os.path.join(CACHE_DIR, 'sentiment_store')
+
+
+def score_texts(texts, workers=None, chunksize=256):
+    """
+    Score texts with TextBlob. With more than one worker the texts are
+    spread over a process pool, which pays off for large backfills.
+    """
+    texts = list(texts)
+    if workers and workers > 1 and len(texts) > chunksize:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(get_sentiment, texts, chunksize=chunksize))
+    return [get_sentiment(text) for text in texts]
+
+
+def _read_scores(path):
+    stored = pd.read_parquet(path)
+    return pd.Series(stored['score'].to_numpy(), index=pd.Index(stored['hash'].to_numpy(), dtype='uint64'))
+
+
+def _write_scores(scores, path):
+    pd.DataFrame({'hash': scores.index.to_numpy(), 'score': scores.to_numpy()}).to_parquet(path, index=False)
+
+
+def _merge_scores(parts):
+    scores = pd.concat(parts)
+    return scores[~scores.index.duplicated()]
+
+
+class SentimentStore:
+    """
+    Sentiment polarity per post content, persisted as Parquet parts and
+    keyed by a hash of the content. Only texts that were never seen
+    before get scored; everything else is a lookup. Each batch of new
+    scores is written as its own part, so scoring costs grow with the
+    new posts rather than with the size of the store.
+    """
+
+    def __init__(self, path=SENTIMENT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._scores = PartLog(path, _read_scores, _write_scores, _merge_scores)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _lookup(self, hashes):
+        """Stored scores of hashes, NaN where missing, and a mask of the hashes found"""
+        scores = np.full(len(hashes), np.nan)
+        found = np.zeros(len(hashes), dtype=bool)
+        for part in self._scores.parts:
+            positions = part.index.get_indexer(hashes)
+            hits = positions >= 0
+            scores[hits] = part.to_numpy()[positions[hits]]
+            found = found | hits
+        return scores, found
+
+    def score(self, texts, workers=None):
+        """
+        Return sentiment scores aligned with texts, scoring and persisting
+        only the contents missing from the store.
+        """
+        texts = pd.Series(texts)
+        hashes = content_hashes(texts)
+
+        with self._lock:
+            scores, found = self._lookup(hashes)
+            if not found.all():
+                missing = ~found
+                new_texts = pd.Series(texts.to_numpy()[missing], index=hashes[missing])
+                new_texts = new_texts[~new_texts.index.duplicated()]
+                new_scores = pd.Series(
+                    score_texts(new_texts.to_numpy(), workers=workers),
+                    index=new_texts.index,
+                    dtype='float64'
+                )
+                self._scores.append(new_scores)
+                scores[missing] = new_scores.to_numpy()[new_scores.index.get_indexer(hashes[missing])]
+
+        return pd.Series(scores, index=texts.index, name='sentiment_score')
+
+
+def backfill(filepath, workers=None, path=SENTIMENT_STORE_PATH):
+    """Score every post of a dataset into the store, returning the number of new scores"""
+    store = SentimentStore(path)
+    before = len(store)
+    store.score(load_and_process_data(filepath)['content'], workers=workers)
+    return len(store) - before
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backfill the sentiment store for a posts CSV")
+    parser.add_argument('filepath')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    print(f"Scored {backfill(args.filepath, workers=args.workers):,} new posts")
@@ -1,6 +1,15 @@
+import os
+
 import streamlit as st
 import pandas as pd
 
+from src.models.data_model import DEFAULT_DATASET, dataset_fingerprint
+from src.models.media import MediaCache, media_source
+
+TAB_LABELS = ["📈 Engagement", "📊 Analysis", "🎧 Podcast", "🎥 Video", "💬 Chatbot"]
+# How often auto-refresh checks the selected dataset for new posts
+REFRESH_SECONDS = int(os.environ.get('MARIPOSA_REFRESH_SECONDS', 60))
+
 
 def apply_custom_css(css_path='src/styles/custom_css.css'):
     """Apply custom CSS styling"""
@@ -20,7 +29,49 @@ def display_title():
         </div>
     """, unsafe_allow_html=True)
 
-def create_audio_player():
+def display_dataset_selector(datasets):
+    """Sidebar choice between the available datasets, given as {name: path}; returns the chosen path"""
+    if len(datasets) < 2:
+        return next(iter(datasets.values()), DEFAULT_DATASET)
+    with st.sidebar:
+        name = st.selectbox("Dataset", options=list(datasets))
+    return datasets[name]
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def _poll_dataset(dataset_path, fingerprint):
+    if dataset_fingerprint(dataset_path) != fingerprint:
+        st.rerun(scope='app')
+
+def watch_dataset(dataset_path):
+    """Sidebar auto-refresh toggle that reruns the dashboard once the dataset file changes"""
+    with st.sidebar:
+        if st.toggle("Auto-refresh", value=False, help=f"Check for new posts every {REFRESH_SECONDS} seconds"):
+            _poll_dataset(dataset_path, dataset_fingerprint(dataset_path))
+
+def _media_player(path, mime, download_label, file_name, media_cache=None):
+    """
+    Player and download button for a media file. The player gets a static
+    URL or the contents shared through media_cache, and the download
+    reads the file only when the button is clicked.
+    """
+    if not os.path.exists(path):
+        st.warning(f"{os.path.basename(path)} is not available")
+        return
+    media_cache = media_cache if media_cache is not None else MediaCache()
+    
+    if mime.startswith('audio/'):
+        st.audio(media_source(path, media_cache), format=mime)
+    else:
+        st.video(media_source(path, media_cache), format=mime)
+    
+    st.download_button(
+        label=download_label,
+        data=lambda: media_cache.read(path),
+        file_name=file_name,
+        mime=mime
+    )
+
+def create_audio_player(dataset_path=DEFAULT_DATASET, media_cache=None):
     """Create audio players using Streamlit's native audio component"""
     
     # First Podcast: MARIPOSA Trial Discussion
@@ -30,18 +81,12 @@ def create_audio_player():
         </h3>
     """, unsafe_allow_html=True)
     
-    audio_path_1 = "src/audio/podcast_pharmad.mp3"
-    audio_file_1 = open(audio_path_1, "rb")
-    audio_bytes_1 = audio_file_1.read()
-    
-    st.audio(audio_bytes_1, format="audio/mp3")
-    audio_file_1.close()
-    
-    st.download_button(
-        label="Download MARIPOSA Podcast",
-        data=audio_bytes_1,
-        file_name="MARIPOSA_Trial_Discussion.mp3",
-        mime="audio/mp3"
+    _media_player(
+        "src/audio/podcast_pharmad.mp3",
+        "audio/mp3",
+        "Download MARIPOSA Podcast",
+        "MARIPOSA_Trial_Discussion.mp3",
+        media_cache
     )
     
     # Add context for MARIPOSA podcast
@@ -64,29 +109,23 @@ def create_audio_player():
         </h3>
     """, unsafe_allow_html=True)
     
-    audio_path_2 = "src/audio/Amivantamab & Lazertinib in EGFR-Mutated NSCLC (2).wav"
-    audio_file_2 = open(audio_path_2, "rb")
-    audio_bytes_2 = audio_file_2.read()
-    
-    st.audio(audio_bytes_2, format="audio/wav")
-    audio_file_2.close()
-    
-    st.download_button(
-        label="Download Amivantamab & Lazertinib Podcast",
-        data=audio_bytes_2,
-        file_name="Amivantamab_Lazertinib_EGFR-Mutated_NSCLC.wav",
-        mime="audio/wav"
+    _media_player(
+        "src/audio/Amivantamab & Lazertinib in EGFR-Mutated NSCLC (2).wav",
+        "audio/wav",
+        "Download Amivantamab & Lazertinib Podcast",
+        "Amivantamab_Lazertinib_EGFR-Mutated_NSCLC.wav",
+        media_cache
     )
     
     # Add combined source information
-    st.markdown("""
+    st.markdown(f"""
         <div style='margin-top: 30px; padding: 20px; background-color: #f8f9fa; border-radius: 5px;'>
             <h4 style='color: #1e293b; margin-bottom: 10px;'>Source Information:</h4>
             <p><strong>Press Release:</strong> <a href='https://www.jnj.com/media-center/press-releases/rybrevant-amivantamab-vmjw-plus-lazcluze-lazertinib-shows-statistically-significant-and-clinically-meaningful-improvement-in-overall-survival-versus-osimertinib' target='_blank'>
             Johnson & Johnson Press Release - RYBREVANT® (amivantamab-vmjw) plus LAZCLUZE™ (lazertinib)</a></p>
             <p><strong>Data Sources:</strong></p>
             <ul>
-                <li>Mariposa Cocoon OS X.csv - Social media engagement data related to the study</li>
+                <li>{os.path.basename(dataset_path)} - Social media engagement data related to the study</li>
                 <li>MARIPOSA Trial Results and Clinical Analysis</li>
             </ul>
         </div>
@@ -98,14 +137,14 @@ def create_audio_player():
     """, unsafe_allow_html=True)
     
     # Read and display the CSV data
-    df = pd.read_csv('Mariposa Cocoon OS X.csv')
+    df = pd.read_csv(dataset_path, nrows=10)
     st.dataframe(
-        df.head(10),
+        df,
         hide_index=True,
         use_container_width=True
     )
 
-def create_video_player():
+def create_video_player(media_cache=None):
     """Create video players using Streamlit's native video component"""
     
     # First Video: MARIPOSA Trial
@@ -115,22 +154,12 @@ def create_video_player():
         </h3>
     """, unsafe_allow_html=True)
     
-    video_path_1 = "src/audio/The MARIPOSA Trial_ A New Era in Lung Cancer Treatment_.mp4"
-    video_file_1 = open(video_path_1, "rb")
-    video_bytes_1 = video_file_1.read()
-    
-    # Display the first video player
-    st.video(video_bytes_1)
-    
-    # Close the file after reading
-    video_file_1.close()
-    
-    # Add a download button for first video
-    st.download_button(
-        label="Download MARIPOSA Trial Video",
-        data=video_bytes_1,
-        file_name="MARIPOSA_Trial_New_Era.mp4",
-        mime="video/mp4"
+    _media_player(
+        "src/audio/The MARIPOSA Trial_ A New Era in Lung Cancer Treatment_.mp4",
+        "video/mp4",
+        "Download MARIPOSA Trial Video",
+        "MARIPOSA_Trial_New_Era.mp4",
+        media_cache
     )
     
     # Add spacing between videos
@@ -143,23 +172,34 @@ def create_video_player():
         </h3>
     """, unsafe_allow_html=True)
     
-    video_path_2 = "src/audio/Advancements in EGFR-Mutated NSCLC Treatment.mp4"
-    video_file_2 = open(video_path_2, "rb")
-    video_bytes_2 = video_file_2.read()
-    
-    # Display the second video player
-    st.video(video_bytes_2)
-    
-    # Close the file after reading
-    video_file_2.close()
-    
-    # Add a download button for second video
-    st.download_button(
-        label="Download NSCLC Treatment Video",
-        data=video_bytes_2,
-        file_name="Advancements_in_EGFR-Mutated_NSCLC_Treatment.mp4",
-        mime="video/mp4"
+    _media_player(
+        "src/audio/Advancements in EGFR-Mutated NSCLC Treatment.mp4",
+        "video/mp4",
+        "Download NSCLC Treatment Video",
+        "Advancements_in_EGFR-Mutated_NSCLC_Treatment.mp4",
+        media_cache
     )
 
-def create_tabs():
-    return st.tabs(["📈 Engagement", "📊 Analysis", "🎧 Podcast", "🎥 Video", "💬 Chatbot"])
+def create_tabs(labels=TAB_LABELS, lazy=False):
+    """
+    Dashboard tabs. With lazy, switching tabs reruns the app and each
+    tab's open attribute tells whether it is the selected one.
+    """
+    if lazy:
+        return st.tabs(labels, key='dashboard_tab', on_change='rerun')
+    return st.tabs(labels)
+
+def render_tabs(renderers, keep_state=None):
+    """
+    Run only the selected tab. renderers maps every tab label to a
+    function drawing its content. Widgets inside a tab are dropped from
+    session state while another tab is selected, so keep_state lists the
+    keys of those whose value should survive, with their defaults.
+    """
+    for key, default in (keep_state or {}).items():
+        st.session_state[key] = st.session_state.get(key, default)
+    
+    for tab, render in zip(create_tabs(list(renderers), lazy=True), renderers.values()):
+        if tab.open:
+            with tab:
+                render()
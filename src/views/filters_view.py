@@ -1,39 +1,44 @@
+import numpy as np
 import streamlit as st
 
+from src.models.data_model import DateIndex, build_author_table, get_text_normalizer
+from src.models.filter_plan import FilterPlan, MaskCache
+from src.models.search_index import InvertedIndex
 
-def apply_date_filter(df):
+ALL_USERS = -1
+
+
+def apply_date_filter(df, plan, date_index=None):
+    date_index = date_index if date_index is not None else DateIndex(df)
     col1, col2 = st.columns(2)
     with col1:
         start_date = st.date_input(
             "Start Date",
-            value=df['date'].min().date(),
-            min_value=df['date'].min().date(),
-            max_value=df['date'].max().date()
+            value=date_index.first_date,
+            min_value=date_index.first_date,
+            max_value=date_index.last_date
         )
 
     with col2:
         end_date = st.date_input(
             "End Date",
-            value=df['date'].max().date(),
-            min_value=df['date'].min().date(),
-            max_value=df['date'].max().date()
+            value=date_index.last_date,
+            min_value=date_index.first_date,
+            max_value=date_index.last_date
         )
 
     if start_date > end_date:
         st.error("End date must be after start date")
         st.stop()
 
-    mask = (df['date'].dt.date >= start_date) & (df['date'].dt.date <= end_date)
-    filtered_df = df[mask]
+    plan.restrict(date_index.positions(start_date, end_date))
 
-    if len(filtered_df) == 0:
+    if plan.count() == 0:
         st.error("No data available for the selected date range. Please select different dates.")
         st.stop()
 
-    return filtered_df
-
 
-def apply_sentiment_filter(df):
+def apply_sentiment_filter(df, plan):
     sentiment_options = ['Positive', 'Neutral', 'Negative']
     selected_sentiments = st.multiselect(
         "Select Sentiment",
@@ -41,42 +46,49 @@ def apply_sentiment_filter(df):
         default=sentiment_options
     )
     if selected_sentiments:
-        sentiment_mask = df['sentiment'].isin(selected_sentiments)
-        df = df[sentiment_mask]
-    return df
+        plan.add(
+            'sentiment',
+            tuple(selected_sentiments),
+            lambda data: data['sentiment'].isin(selected_sentiments).to_numpy()
+        )
 
 
-def apply_word_filters(df):
+def apply_word_filters(df, plan, search_index=None):
     include_words_input = st.text_input(
         "Include Posts with Words (comma-separated)",
         help="Enter words separated by commas to only include posts containing these words."
     )
-    if include_words_input:
-        include_words = [word.strip().lower() for word in include_words_input.split(',') if word.strip()]
-        if include_words:
-            include_mask = df['content'].str.lower().str.contains('|'.join(include_words), regex=True)
-            df = df[include_mask]
-
     exclude_words_input = st.text_input(
         "Exclude Posts with Words (comma-separated)",
         help="Enter words separated by commas to exclude posts containing these words."
     )
-    if exclude_words_input:
-        exclude_words = [word.strip().lower() for word in exclude_words_input.split(',') if word.strip()]
-        if exclude_words:
-            exclude_mask = ~df['content'].str.lower().str.contains('|'.join(exclude_words), regex=True)
-            df = df[exclude_mask]
+    match_partial = st.checkbox(
+        "Match partial words",
+        value=False,
+        help="Also match words inside longer words, e.g. 'cancer' in 'cancers'."
+    )
+
+    normalizer = get_text_normalizer()
+    include_words = normalizer.terms(include_words_input) if include_words_input else []
+    exclude_words = normalizer.terms(exclude_words_input) if exclude_words_input else []
+    if not include_words and not exclude_words:
+        return
+
+    def matches(data):
+        index = search_index if search_index is not None else InvertedIndex(data)
+        return index.mask(include_words, exclude_words, substring=match_partial)
 
-    return df
+    plan.add('words', (tuple(include_words), tuple(exclude_words), match_partial), matches)
 
 
-def apply_numeric_filter(df, column, label):
-    min_val = int(df[column].min())
-    max_val = int(df[column].max())
+def apply_numeric_filter(df, plan, column, label):
+    values = plan.column(column)
+    min_val = int(values.min())
+    max_val = int(values.max())
     
     if min_val == max_val:
         st.markdown(f"*All {'posts' if column == 'likes' else 'users'} have **{min_val}** {column}*")
-        return df
+        return
     
     value_range = st.slider(
         f"Number of {label}",
@@ -84,28 +96,47 @@ def apply_numeric_filter(df, column, label):
         max_value=max_val,
         value=(min_val, max_val)
     )
-    mask = (df[column] >= value_range[0]) & (df[column] <= value_range[1])
-    return df[mask]
 
+    def in_range(data):
+        values = data[column].to_numpy()
+        return (values >= value_range[0]) & (values <= value_range[1])
+
+    plan.add(f'numeric_{column}', value_range, in_range)
+
+
+def apply_user_filter(df, plan, author_table=None):
+    author_table = author_table if author_table is not None else build_author_table(df)
+
+    def rank_users():
+        # Get users sorted by total views, as author ids
+        codes = plan.column('user name').cat.codes.to_numpy()
+        views = plan.column('views').to_numpy(dtype='float64')
+        known = codes >= 0
+        user_views = np.bincount(codes[known], weights=views[known], minlength=len(author_table))
+        posted = np.flatnonzero(np.bincount(codes[known], minlength=len(author_table)))
+        ranked = posted[np.argsort(-user_views[posted], kind='stable')]
+        names = author_table['user name'].to_numpy()
+        labels = {ALL_USERS: 'All Users'}
+        labels.update(
+            (author_id, f"{name} ({int(total):,} views)")
+            for author_id, name, total in zip(ranked.tolist(), names[ranked], user_views[ranked])
+        )
+        return [ALL_USERS] + ranked.tolist(), labels
 
-def apply_user_filter(df):
-    # Get users sorted by total views
-    user_views = df.groupby('user name')['views'].sum().sort_values(ascending=False)
-    user_options = ['All Users'] + list(user_views.index)
+    # Only the date window precedes this filter, so the ranking follows it
+    user_options, labels = plan.memo('user_options', (plan.rows.start, plan.rows.stop), rank_users)
     
     selected_user = st.selectbox(
         "Filter by User (Ranked by Views)",
         options=user_options,
-        format_func=lambda x: f"{x} ({int(user_views[x]):,} views)" if x != 'All Users' else x
+        format_func=labels.__getitem__
     )
     
-    if selected_user != 'All Users':
-        df = df[df['user name'] == selected_user]
-    
-    return df
+    if selected_user != ALL_USERS:
+        plan.add('user', selected_user, lambda data: data['user name'].cat.codes.to_numpy() == selected_user)
 
 
-def display_filters(df):
+def display_filters(df, search_index=None, date_index=None, author_table=None):
     with st.sidebar:
         st.markdown("""
             <div style='padding: 1rem 0; border-bottom: 1px solid #e2e8f0;'>
@@ -118,18 +149,24 @@ def display_filters(df):
             </div>
         """, unsafe_allow_html=True)
         try:
-            filtered_df = apply_date_filter(df)
-            filtered_df = apply_user_filter(filtered_df)
-            filtered_df = apply_sentiment_filter(filtered_df)
-            filtered_df = apply_word_filters(filtered_df)
-            filtered_df = apply_numeric_filter(filtered_df, 'likes', 'Likes')
-            filtered_df = apply_numeric_filter(filtered_df, 'followers', 'Followers')
-
-            if len(filtered_df) == 0:
+            # Masks of unchanged filters are reused between reruns
+            if 'filter_mask_cache' not in st.session_state:
+                st.session_state.filter_mask_cache = MaskCache()
+            plan = FilterPlan(df, st.session_state.filter_mask_cache)
+
+            apply_date_filter(df, plan, date_index)
+            apply_user_filter(df, plan, author_table)
+            apply_sentiment_filter(df, plan)
+            apply_word_filters(df, plan, search_index)
+            apply_numeric_filter(df, plan, 'likes', 'Likes')
+            apply_numeric_filter(df, plan, 'followers', 'Followers')
+
+            if plan.count() == 0:
                 st.error("No data available after applying the selected filters. Please adjust your filter criteria.")
                 st.stop()
 
-            return filtered_df
+            # The plan identifies the selection for results memoized per filter state
+            return plan.apply(), plan
 
         except Exception as e:
             st.error(f"Error with filter selection: {str(e)}")
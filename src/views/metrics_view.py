@@ -1,14 +1,51 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
-from src.models.data_model import get_word_frequency, analyze_text_content
 
+from src.models.downsample import SAMPLING_METHODS, sample_points
+from src.models.ranking import TopRanking
+
+# Selections above this many posts switch the scatter to WebGL
+WEBGL_THRESHOLD = 2000
+# Selections above this many posts are thinned out before plotting
+MAX_SCATTER_POINTS = 5000
+# Posts per page of the top posts table
+TABLE_PAGE_SIZE = 100
+
+
+def choose_scatter_sampling(df, max_points=MAX_SCATTER_POINTS):
+    """Let the user pick how large selections are thinned out; returns the method or None for every point"""
+    if len(df) <= max_points:
+        return None
+    labels = {'density': 'Density-aware', 'lttb': 'Shape-preserving (LTTB)', None: 'All points'}
+    return st.radio(
+        f"Plotting {len(df):,} posts",
+        options=SAMPLING_METHODS + [None],
+        format_func=labels.__getitem__,
+        horizontal=True,
+        help=f"Large selections are reduced to about {max_points:,} points; the most viewed and liked posts are always shown"
+    )
+
+def create_engagement_scatter(df, sampling='density', max_points=MAX_SCATTER_POINTS):
+    """
+    Create engagement scatter plot with updated aesthetics. Selections
+    larger than max_points are thinned out with sampling (see
+    sample_points) unless it is None, and large ones render with WebGL.
+    """
+    total = len(df)
+    if sampling is not None and total > max_points:
+        df = df.iloc[sample_points(df['views'].to_numpy(), df['likes'].to_numpy(), max_points, sampling)]
+
+    hover_text = (
+        '@' + df['user name'].astype(str) + ': '
+        + df['content'].fillna('').astype(str).str.slice(0, 50) + '...'
+    )
+    scatter = go.Scattergl if len(df) > WEBGL_THRESHOLD else go.Scatter
 
-def create_engagement_scatter(df):
-    """Create engagement scatter plot with updated aesthetics"""
     fig = go.Figure()
-    fig.add_trace(go.Scatter(
+    fig.add_trace(scatter(
         x=df['views'],
         y=df['likes'],
         mode='markers',
@@ -19,7 +56,7 @@ def create_engagement_scatter(df):
             showscale=True,
             colorbar=dict(title='Sentiment Score')
         ),
-        text=[f"@{user}: {content[:50]}..." for user, content in zip(df['user name'], df['content'])],
+        text=hover_text,
         hovertemplate=("<b>User:</b> @%{text}<br>"
                       "<b>Views:</b> %{x}<br>"
                       "<b>Likes:</b> %{y}<br>"
@@ -27,6 +64,10 @@ def create_engagement_scatter(df):
                       "<extra></extra>")
     ))
 
+    subtitle = "Circle size indicates number of followers"
+    if len(df) < total:
+        subtitle += f" · showing {len(df):,} of {total:,} posts"
+
     fig.update_layout(
         title={
             'text': 'Engagement Analysis',
@@ -34,7 +75,7 @@ def create_engagement_scatter(df):
         },
         annotations=[
             dict(
-                text="Circle size indicates number of followers",
+                text=subtitle,
                 xref="paper",
                 yref="paper",
                 x=0,
@@ -53,9 +94,16 @@ def create_engagement_scatter(df):
     )
     return fig
 
-def create_time_series(df, metric, chart_type='line'):
+def create_time_series(df, metric, chart_type='line', date_index=None):
     """Create time series chart with specified metric and chart type"""
-    daily_metric = df.groupby(df['date'].dt.date)[metric].sum().reset_index()
+    start_date, end_date = df['date'].min().date(), df['date'].max().date()
+    window = date_index.positions(start_date, end_date) if date_index is not None else None
+    
+    # Serve the precomputed daily sums when df is a whole date window
+    if window is not None and metric in date_index.daily_sums and window.stop - window.start == len(df):
+        daily_metric = date_index.daily(metric, start_date, end_date)
+    else:
+        daily_metric = df.groupby(df['date'].dt.date)[metric].sum().reset_index()
     
     if metric == 'engagement_rate':
         title = 'Daily Engagement Rate (%)'
@@ -97,16 +145,12 @@ def create_time_series(df, metric, chart_type='line'):
     
     return fig
 
-def create_word_freq_chart(df, include_common=False, min_words=2, max_words=5):
-    """Create word frequency bar chart for phrases"""
-    # Combine all content for analysis
-    all_text = ' '.join(df['content'].astype(str))
-    
-    # Get word frequencies using improved analysis
-    word_freq = get_word_frequency(all_text, include_common, min_words, max_words)
-    
+def create_word_freq_chart(word_freq, min_words=2, max_words=5, document_freq=None):
+    """
+    Create word frequency bar chart for phrases, with the number of posts
+    using each in the hover. Returns None when there are no phrases.
+    """
     if not word_freq:
-        st.info("No significant phrases found. Try including common terms or adjusting filters.")
         return None
     
     # Get top phrases
@@ -121,6 +165,12 @@ def create_word_freq_chart(df, include_common=False, min_words=2, max_words=5):
         color_continuous_scale='Viridis'
     )
     
+    if document_freq is not None:
+        fig.update_traces(
+            customdata=[document_freq.get(phrase, 0) for phrase, _ in top_phrases],
+            hovertemplate="<b>%{y}</b><br>Count: %{x}<br>Posts: %{customdata}<extra></extra>"
+        )
+    
     fig.update_layout(
         title={
             'text': f'Top Phrases ({min_words}-{max_words} words)',
@@ -172,17 +222,33 @@ def create_pie_chart(sentiment_counts):
     )
     return fig
 
-def create_user_table(df):
-    """Create formatted table of top posts"""
-    table_df = df.sort_values('views', ascending=False).head(100)
+def _thousands(values):
+    """Whole numbers as strings with thousands separators"""
+    return values.astype('int64').astype(str).str.replace(r'\B(?=(\d{3})+$)', ',', regex=True)
+
+def choose_table_page(total, page_size=TABLE_PAGE_SIZE):
+    """Page picker for the top posts table, shown when there is more than one page; returns the page from 0"""
+    pages = -(-total // page_size)
+    if pages < 2:
+        return 0
+    return st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1) - 1
+
+def create_user_table(df, ranking=None, page=0, page_size=TABLE_PAGE_SIZE):
+    """
+    Create formatted table of top posts, one page of page_size posts by
+    views. ranking (a TopRanking over df's views) can be kept between
+    calls so later pages extend it instead of ranking df again.
+    """
+    ranking = ranking if ranking is not None else TopRanking(df['views'].to_numpy())
+    table_df = df.iloc[ranking.page(page, page_size)]
 
+    content = table_df['content'].fillna('').astype(str)
     display_df = pd.DataFrame({
-        'Username': ['@' + str(username) for username in table_df['user name']],
+        'Username': '@' + table_df['user name'].astype(str),
         'Date': table_df['date'].dt.strftime('%Y-%m-%d'),
-        'Content': [content[:500] + ('...' if len(str(content)) > 500 else '')
-                    for content in table_df['content']],
-        'Followers': [f"{int(followers):,}" for followers in table_df['followers']],
-        'Views': [f"{int(views):,}" for views in table_df['views']]
+        'Content': content.str.slice(0, 500) + np.where(content.str.len() > 500, '...', ''),
+        'Followers': _thousands(table_df['followers']),
+        'Views': _thousands(table_df['views'])
     })
 
     return display_df 